@@ -1,5 +1,6 @@
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -31,7 +32,6 @@ INSTALLED_APPS = [
     "corsheaders",
     'rest_framework',
     'djoser',
-    "debug_toolbar",
     'store',
     'tags',
     'likes',
@@ -41,16 +41,39 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
+    'core.instrumentation.InstrumentationMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# the toolbar instruments every query and template; development only
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(MIDDLEWARE.index('core.instrumentation.InstrumentationMiddleware') + 1, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# per-request "Server-Timing: db;dur=..;desc=\"N queries\", app;dur=.." header;
+# off by default outside DEBUG, it tells anyone how long the database work behind an endpoint takes
+CORE_SERVER_TIMING = os.getenv('SERVER_TIMING', str(DEBUG)) == 'True'
+
+# statements slower than this are fingerprinted, EXPLAINed and aggregated in core.SlowQuery (0 disables)
+CORE_SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', '200'))
+CORE_SLOW_QUERY_EXPLAIN = True
+CORE_SLOW_QUERY_BUFFER = 200       # recent slow statements kept in memory per process
+CORE_SLOW_QUERY_TABLE_SIZE = 500   # fingerprints kept in the table, cheapest dropped first
+
+# cProfile a request when a staff user sends "X-Profile: 1", or a sampled fraction of all requests
+# outside the source tree by default, profiles must never end up in a commit
+CORE_PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'ecommerce-profiles'))
+CORE_PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+CORE_PROFILE_MAX_FILES = 200
+
 ROOT_URLCONF = 'Ecommerce.urls'
 
 TEMPLATES = [
@@ -131,6 +154,9 @@ INTERNAL_IPS = [
 ]
 
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:8001,http://127.0.0.1:8001').split(',')
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'if-none-match', 'if-modified-since')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified']
 
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,  
@@ -139,6 +165,17 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # orjson-backed JSON (core/renderers.py), same bytes as DRF's JSONRenderer/JSONParser;
+    # a viewset can opt out with renderer_classes/parser_classes
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 from django.utils import timezone
@@ -178,4 +215,102 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': 60.0, # every minute
         'args': ("This is a periodic notification to the customer.",)
     },
+    'drain-outbox': {
+        'task': 'store.tasks.drain_outbox',
+        'schedule': 2.0, # seconds
+    },
+    'purge-outbox-daily': {
+        'task': 'store.tasks.purge_outbox',
+        'schedule': 60.0 * 60 * 24,
+    },
+    'trim-slow-queries-hourly': {
+        'task': 'core.tasks.trim_slow_queries',
+        'schedule': 60.0 * 60,
+    },
+    'reconcile-like-counters-hourly': {
+        'task': 'likes.tasks.reconcile_like_counters',
+        'schedule': 60.0 * 60,
+    },
 }
+
+# Caching
+# Everything runs on in-process locmem caches unless CACHE_REDIS_URL is set. With several
+# web workers Redis is required so catalog version bumps are seen by every process.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        },
+        'catalog': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'catalog',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'catalog': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'catalog',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+
+# Product catalog response cache (store/cache.py)
+STORE_CATALOG_CACHE_ENABLED = os.getenv('STORE_CATALOG_CACHE_ENABLED', 'True') == 'True'
+STORE_CATALOG_CACHE_ALIAS = 'catalog'
+STORE_CATALOG_CACHE_TIMEOUT = 300 # seconds
+# Cache-Control max-age on catalog GETs; clients and CDNs revalidate with ETag/If-None-Match after it
+STORE_CATALOG_HTTP_MAX_AGE = 0
+
+# Build product list/detail responses from .values() rows instead of ProductSerializer (store/fast_reads.py);
+# the JSON is identical, `manage.py bench_serializers` checks it and compares throughput
+STORE_FAST_PRODUCT_READS = os.getenv('STORE_FAST_PRODUCT_READS', 'False') == 'True'
+
+# Tag cloud counts (tags/views.py TagCountsView), also dropped whenever a tag changes
+TAGS_COUNTS_CACHE_TIMEOUT = 600 # seconds
+
+# Models that can be liked through likes/<app_label.model_name>/ (likes/views.py)
+LIKES_MODELS = ['store.product']
+
+# Product search (store/search.py)
+STORE_SEARCH_TITLE_BOOST = 3.0
+
+# Title autocomplete (store/autocomplete.py): how often a process replays the title
+# changes other processes published
+STORE_AUTOCOMPLETE_SYNC_SECONDS = 5
+
+# Serve Collection.products_count from the denormalized column instead of a COUNT annotation
+STORE_DENORMALIZED_COLLECTION_COUNTS = os.getenv('STORE_DENORMALIZED_COLLECTION_COUNTS', 'False') == 'True'
+
+# Cart storage (store/carts.py). Carts live in Redis hashes when CART_REDIS_URL is set and
+# only reach the database as order items at checkout; otherwise they use the Cart/CartItem tables.
+STORE_CART_REDIS_URL = os.getenv('CART_REDIS_URL')
+STORE_CART_BACKEND = 'store.carts.RedisCartStore' if STORE_CART_REDIS_URL else 'store.carts.DatabaseCartStore'
+STORE_CART_TTL = 60 * 60 * 24 * 7 # seconds of inactivity before an anonymous cart expires
+
+# Checkout (store/checkout.py): cart lines per conditional inventory UPDATE
+STORE_CHECKOUT_BATCH_SIZE = 100
+
+# Idempotency-Key handling for order and cart POSTs (store/idempotency.py)
+STORE_IDEMPOTENCY_CACHE_ALIAS = 'default'
+STORE_IDEMPOTENCY_TTL = 60 * 60 * 24 # how long a stored response can be replayed
+STORE_IDEMPOTENCY_LOCK_TIMEOUT = 30 # upper bound for a request in flight
+
+# Transactional outbox (store/outbox.py)
+STORE_OUTBOX_BATCH_SIZE = 500
+STORE_OUTBOX_MAX_BATCHES = 20 # per drain run
+STORE_OUTBOX_MAX_ATTEMPTS = 5
+STORE_OUTBOX_RETENTION_DAYS = 7
+
+# uploads over this are cut off while the multipart body streams in (store.uploads)
+STORE_MAX_IMAGE_UPLOAD_KB = 500
+
+# product image variants (store.tasks.generate_image_variants)
+STORE_IMAGE_VARIANT_WIDTHS = [160, 320, 640, 1280]
+STORE_IMAGE_WEBP_QUALITY = 80
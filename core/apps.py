@@ -6,3 +6,11 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         import core.signals.handlers
+        from django.db.backends.signals import connection_created
+        from core import instrumentation, slow_queries
+        if slow_queries.threshold_ms():
+            connection_created.connect(slow_queries.install, dispatch_uid='core.slow_queries.install')
+            # entries queued by a task whose transaction rolled back are written when it ends
+            from celery.signals import task_postrun
+            task_postrun.connect(slow_queries.recorder.flush, weak=False, dispatch_uid='core.slow_queries.flush')
+            instrumentation.register_collector(slow_queries.slow_query_metrics)
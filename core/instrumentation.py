@@ -0,0 +1,177 @@
+import bisect
+import contextlib
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connections
+
+
+# upper bounds in seconds, as in the Prometheus client defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED = '<unmatched>'
+# any other verb a client sends is counted as "other", so the label set stays bounded
+METHODS = frozenset(['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'])
+
+# samples are (labels dict, value) or (sample name, labels dict, value) tuples;
+# extra collectors registered with register_collector return these
+Metric = namedtuple('Metric', ['name', 'type', 'help', 'samples'])
+
+
+# connection.execute_wrapper hook: counts queries and the time spent in them
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.bounds, float('inf')), self.buckets):
+            total += count
+            yield bound, total
+
+
+# Per-route aggregates for this process. Routes are resolved URL names
+# ("products-list", "cart-items-detail"), so the label set stays bounded.
+class RouteMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._latency = {}
+            self._db_time = {}
+            self._queries = {}
+            self._responses = {}
+
+    def observe(self, route, method, status, duration, queries, db_time):
+        key = (route, method)
+        with self._lock:
+            self._latency.setdefault(key, Histogram()).observe(duration)
+            self._db_time.setdefault(key, Histogram()).observe(db_time)
+            self._queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(queries)
+            self._responses[key + (str(status),)] = self._responses.get(key + (str(status),), 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            histograms = [
+                ('http_request_duration_seconds', 'Request latency by route', self._latency),
+                ('http_request_db_seconds', 'Time spent in database queries per request by route', self._db_time),
+                ('http_request_queries', 'Database queries per request by route', self._queries),
+            ]
+            metrics = []
+            for name, help_text, series in histograms:
+                samples = []
+                for (route, method), histogram in sorted(series.items()):
+                    labels = {'route': route, 'method': method}
+                    for bound, total in histogram.cumulative():
+                        samples.append((f'{name}_bucket', {**labels, 'le': format_bound(bound)}, total))
+                    samples.append((f'{name}_sum', labels, histogram.sum))
+                    samples.append((f'{name}_count', labels, histogram.count))
+                metrics.append(Metric(name, 'histogram', help_text, samples))
+            metrics.append(Metric('http_responses_total', 'counter', 'Responses by route and status code', [
+                ('http_responses_total', {'route': route, 'method': method, 'status': status}, count)
+                for (route, method, status), count in sorted(self._responses.items())
+            ]))
+        return metrics
+
+
+def format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+routes = RouteMetrics()
+_collectors = []
+
+
+def register_collector(collector):
+    # collector() returns an iterable of Metric; called on every scrape
+    if collector not in _collectors:
+        _collectors.append(collector)
+    return collector
+
+
+def collect():
+    metrics = routes.snapshot()
+    for collector in _collectors:
+        metrics.extend(collector())
+    return metrics
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render_prometheus(metrics):
+    lines = []
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for sample in metric.samples:
+            # collectors may give (labels, value) and use the metric name for the sample
+            name, labels, value = sample if len(sample) == 3 else (metric.name, *sample)
+            label_text = ','.join(f'{key}="{escape_label(val)}"' for key, val in labels.items())
+            lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return UNMATCHED
+    return match.view_name  # url_name with its namespace, if any
+
+
+def method_label(request):
+    return request.method if request.method in METHODS else 'other'
+
+
+# Always-on, so it only keeps counters: times the request, counts queries and
+# their time on every configured database, adds a Server-Timing header and
+# feeds the per-route histograms served by core.views.MetricsView.
+# Queries a StreamingHttpResponse runs while streaming happen after this returns
+# and are not counted.
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        routes.observe(route_name(request), method_label(request), response.status_code, duration, timer.count, timer.duration)
+        if getattr(settings, 'CORE_SERVER_TIMING', settings.DEBUG):
+            response['Server-Timing'] = (
+                f'db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries", '
+                f'app;dur={duration * 1000:.1f}'
+            )
+        return response
@@ -0,0 +1,44 @@
+import os
+import pstats
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = 'Aggregate the request profiles written by ProfilingMiddleware into a top-functions report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--route', default=None, help='only profiles of this route (e.g. products-list)')
+        parser.add_argument('--sort', choices=['cumulative', 'tottime', 'calls'], default='cumulative')
+        parser.add_argument('--limit', type=int, default=30, help='number of functions to print')
+        parser.add_argument('--latest', type=int, default=None, help='only the N most recent profiles')
+        parser.add_argument('--full-paths', action='store_true', help='keep directory names in function locations')
+
+    def handle(self, *args, **options):
+        directory = profiling.profile_dir()
+        if not os.path.isdir(directory):
+            raise CommandError(f'No profiles in {directory}')
+
+        selected = []
+        for name in sorted(os.listdir(directory)):
+            match = profiling.FILE_RE.match(name)
+            if match and (options['route'] is None or match['route'] == options['route']):
+                selected.append((name, match))
+        if options['latest']:
+            selected = selected[-options['latest']:]
+        if not selected:
+            raise CommandError('No matching profiles')
+
+        routes = {}
+        for _, match in selected:
+            routes.setdefault(match['route'], []).append(int(match['ms']))
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{len(selected)} profiles'))
+        for route, durations in sorted(routes.items(), key=lambda item: -sum(item[1])):
+            self.stdout.write(f'  {route:<30} {len(durations):>5} requests  median {statistics.median(durations):.0f}ms  max {max(durations)}ms')
+
+        stats = pstats.Stats(*(os.path.join(directory, name) for name, _ in selected), stream=self.stdout)
+        if not options['full_paths']:
+            stats.strip_dirs()
+        stats.sort_stats(options['sort']).print_stats(options['limit'])
@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db.models import ExpressionWrapper, F, FloatField
+from core.models import SlowQuery
+
+
+ORDERINGS = {
+    'total': '-total_ms',
+    'max': '-max_ms',
+    'calls': '-calls',
+    'avg': '-avg_ms',
+}
+
+
+class Command(BaseCommand):
+    help = 'Rank the recorded slow query fingerprints (see CORE_SLOW_QUERY_MS) by total time, worst first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--order', choices=sorted(ORDERINGS), default='total')
+        parser.add_argument('--view', default=None, help='only fingerprints last seen in this route')
+        parser.add_argument('--plans', action='store_true', help='print the captured EXPLAIN output')
+        parser.add_argument('--json', action='store_true')
+        parser.add_argument('--reset', action='store_true', help='delete every recorded fingerprint')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'{deleted} fingerprints deleted'))
+            return
+
+        queries = SlowQuery.objects.annotate(
+            avg_ms=ExpressionWrapper(F('total_ms') / F('calls'), output_field=FloatField())
+        ).filter(calls__gt=0)
+        if options['view']:
+            queries = queries.filter(view=options['view'])
+        queries = queries.order_by(ORDERINGS[options['order']])[:options['limit']]
+
+        rows = [
+            {
+                'fingerprint': query.fingerprint, 'view': query.view, 'calls': query.calls,
+                'total_ms': round(query.total_ms, 1), 'avg_ms': round(query.avg_ms, 1), 'max_ms': round(query.max_ms, 1),
+                'last_seen': query.last_seen.isoformat(), 'sql': query.sql, 'plan': query.plan,
+            }
+            for query in queries
+        ]
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        if not rows:
+            self.stdout.write('No slow queries recorded')
+            return
+
+        for rank, row in enumerate(rows, start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'#{rank} {row["fingerprint"][:12]}  total {row["total_ms"]}ms  calls {row["calls"]}  '
+                f'avg {row["avg_ms"]}ms  max {row["max_ms"]}ms  view {row["view"] or "-"}'
+            ))
+            self.stdout.write(f'  {row["sql"][:2000]}')
+            if options['plans'] and row['plan']:
+                for line in row['plan'].splitlines():
+                    self.stdout.write(f'    {line}')
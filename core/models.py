@@ -3,4 +3,19 @@ from django.contrib.auth.models import AbstractUser
 
 # Create your models here.
 class User(AbstractUser):
-    email = models.EmailField(unique=True)
\ No newline at end of file
+    email = models.EmailField(unique=True)
+
+# One row per normalized statement, aggregated by core.slow_queries
+class SlowQuery(models.Model):
+    fingerprint = models.CharField(max_length=40, unique=True)
+    sql = models.TextField()
+    plan = models.TextField(blank=True)
+    view = models.CharField(max_length=255, blank=True)
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.fingerprint
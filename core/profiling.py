@@ -0,0 +1,100 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from core.instrumentation import route_name
+
+
+logger = logging.getLogger(__name__)
+
+SAFE_NAME_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+# <epoch ms>-<route>-<duration ms>ms-<pid>.prof, parsed back by profile_report
+FILE_RE = re.compile(r'^(?P<at>\d+)-(?P<route>.+)-(?P<ms>\d+)ms-(?P<pid>\d+)\.prof$')
+
+# cProfile cannot run two profilers at once (sys.monitoring on 3.12+), so
+# concurrent candidates are skipped instead of queued
+_profiling = threading.Lock()
+
+
+def profile_dir():
+    return getattr(settings, 'CORE_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'ecommerce-profiles'))
+
+
+def header_name():
+    return getattr(settings, 'CORE_PROFILE_HEADER', 'X-Profile')
+
+
+def is_staff(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    # API clients authenticate with JWT inside DRF, after the middleware stack
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(result and result[0].is_staff)
+
+
+def rotate(directory, keep):
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+    for name in names[:max(len(names) - keep, 0)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def save(profiler, route, duration):
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = f'{int(time.time() * 1000)}-{SAFE_NAME_RE.sub("_", route)}-{int(duration * 1000)}ms-{os.getpid()}.prof'
+    profiler.dump_stats(os.path.join(directory, name))
+    rotate(directory, getattr(settings, 'CORE_PROFILE_MAX_FILES', 200))
+    return name
+
+
+# Runs a request under cProfile when a staff user sends the X-Profile header,
+# or for a CORE_PROFILE_SAMPLE_RATE fraction of all requests, and writes the
+# stats to CORE_PROFILE_DIR (oldest files rotated out). Summarize the files
+# with the profile_report command.
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def wanted(self, request):
+        if request.headers.get(header_name()):
+            return is_staff(request)
+        rate = getattr(settings, 'CORE_PROFILE_SAMPLE_RATE', 0.0)
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.wanted(request) or not _profiling.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+        finally:
+            _profiling.release()
+        try:
+            name = save(profiler, route_name(request), duration)
+        except OSError:
+            logger.exception('Could not write request profile')
+            return response
+        if request.headers.get(header_name()):
+            response['X-Profile-Id'] = name
+        return response
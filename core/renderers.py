@@ -0,0 +1,70 @@
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # the stdlib renderer/parser are used as they are
+    orjson = None
+
+
+LINE_SEPARATOR, PARAGRAPH_SEPARATOR = '\u2028'.encode(), '\u2029'.encode()
+
+if orjson is not None:
+    # datetime/date/time go to DRF's encoder, which trims microseconds to
+    # milliseconds and writes UTC as "Z"; non-str dict keys are stringified like json.dumps
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def is_available():
+    return orjson is not None
+
+
+# Drop-in replacement for DRF's JSONRenderer that encodes with orjson. Whatever
+# orjson does not handle natively (Decimal, datetime, lazy strings, phone
+# numbers, querysets, ...) goes through DRF's JSONEncoder.default, so the bytes
+# match the stdlib renderer for everything the API returns; UUIDs and dates
+# come out the same from orjson itself.
+# Falls back to the stdlib renderer for indented output (the browsable API,
+# ?indent), non-default UNICODE_JSON/COMPACT_JSON settings, values orjson
+# rejects (ints over 64 bits) and when orjson is not installed.
+# Unlike STRICT_JSON, orjson writes NaN and Infinity as null instead of failing.
+class FastJSONRenderer(JSONRenderer):
+    def uses_stdlib(self, accepted_media_type, renderer_context):
+        return (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context) is not None)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.uses_stdlib(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # the stdlib encoder either manages (big ints) or raises the error DRF would
+            return super().render(data, accepted_media_type, renderer_context)
+        # like JSONRenderer: keep the output valid inside <script> / JavaScript
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+
+# JSONParser on orjson. orjson only reads UTF-8 and rejects NaN/Infinity like
+# STRICT_JSON does; bodies in other charsets, or that orjson cannot parse (ints
+# over 64 bits, malformed JSON), go through the stdlib parser, which also
+# produces DRF's usual ParseError message.
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -1,7 +1,37 @@
 from store.signals import order_created
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from store import cache as catalog_cache
+from store.models import Product
+from tags import cache as tag_cache
+from tags.models import Tag, TaggedItem
 
 @receiver(order_created)
 def on_order_created(sender, **kwargs):
     # Example handler function for order_created signal
-    print(kwargs['order'])
\ No newline at end of file
+    print(kwargs['order'])
+
+
+# Tags live in their own app; product payloads (?include=tags) and ?tag= listings depend on them
+@receiver([post_save, post_delete], sender=TaggedItem)
+def invalidate_for_tagged_item(sender, instance, **kwargs):
+    tag_cache.bump_counts_version()
+    if instance.content_type_id != ContentType.objects.get_for_model(Product).pk:
+        return
+    collection_id = Product.objects.filter(pk=instance.object_id).values_list('collection_id', flat=True).first()
+    catalog_cache.invalidate([collection_id])
+    # moves the product's Last-Modified/ETag like image changes do
+    Product.objects.filter(pk=instance.object_id).update(last_update=timezone.now())
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_for_tag(sender, instance, created, **kwargs):
+    # deleting a tag deletes its TaggedItems, which are handled above
+    if created:
+        return
+    tag_cache.bump_counts_version()
+    tagged = TaggedItem.objects.filter(tag=instance, content_type=ContentType.objects.get_for_model(Product))
+    if Product.objects.filter(pk__in=tagged.values('object_id')).update(last_update=timezone.now()):
+        catalog_cache.invalidate()
@@ -0,0 +1,234 @@
+import collections
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from core.instrumentation import Metric, route_name
+from core.models import SlowQuery
+
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIX = {
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+MAX_SQL_LENGTH = 10_000
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+SPACE_RE = re.compile(r'\s+')
+
+# route of the request being served, set by SlowQueryMiddleware
+current_view = contextvars.ContextVar('slow_query_view', default='')
+
+
+def threshold_ms():
+    return getattr(settings, 'CORE_SLOW_QUERY_MS', 200)
+
+
+def normalize(sql):
+    # Django passes parameters separately, so literals are rare; IN lists are
+    # what make one query shape look like many (IN (%s, %s) vs IN (%s, %s, %s))
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()
+
+
+class _Guard(threading.local):
+    active = False
+
+
+_guard = _Guard()
+
+
+class guarded:
+    # EXPLAIN and the bookkeeping writes run through the same wrapper; never record them
+    def __enter__(self):
+        self.previous, _guard.active = _guard.active, True
+
+    def __exit__(self, *exc_info):
+        _guard.active = self.previous
+
+
+def explain(alias, sql, params):
+    connection = connections[alias]
+    prefix = EXPLAIN_PREFIX.get(connection.vendor)
+    if prefix is None or not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+    try:
+        with guarded(), transaction.atomic(using=alias):  # a savepoint, so a failed EXPLAIN cannot poison the caller's transaction
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+    except DatabaseError:
+        logger.debug('EXPLAIN failed for slow query', exc_info=True)
+        return ''
+    return '\n'.join(' | '.join('' if value is None else str(value) for value in row) for row in rows)
+
+
+# Execute wrapper installed on every connection (see core.apps). Statements over
+# CORE_SLOW_QUERY_MS are fingerprinted, explained once per fingerprint per
+# process, kept in a bounded in-memory buffer and queued for the SlowQuery table.
+# The queue is never written inside the caller's transaction, where the rows
+# would roll back with it and hold SlowQuery row locks until it ends: inside a
+# request it is written when the response is done; elsewhere (Celery, management
+# commands) right away outside a transaction, otherwise once it commits, or at
+# the next flush (end of the Celery task) if it rolled back.
+# The table is kept to CORE_SLOW_QUERY_TABLE_SIZE by the trim_slow_queries task.
+class SlowQueryRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._plans = {}
+        self._pending = threading.local()
+        self.recent = collections.deque(maxlen=getattr(settings, 'CORE_SLOW_QUERY_BUFFER', 200))
+        self.recorded = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if _guard.active:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        # failed statements are not recorded: the transaction may be unusable for EXPLAIN
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - started) * 1000
+        limit = threshold_ms()
+        if limit and duration_ms >= limit:
+            self.record(context['connection'].alias, sql, None if many else params, duration_ms)
+        return result
+
+    def record(self, alias, sql, params, duration_ms):
+        key = fingerprint(sql)
+        with self._lock:
+            plan = self._plans.get(key)
+        if plan is None and getattr(settings, 'CORE_SLOW_QUERY_EXPLAIN', True) and params is not None:
+            plan = explain(alias, sql, params)
+            with self._lock:
+                if len(self._plans) >= 1000:
+                    self._plans.clear()
+                self._plans[key] = plan
+        entry = {
+            'fingerprint': key,
+            'sql': normalize(sql)[:MAX_SQL_LENGTH],
+            'plan': plan or '',
+            'view': current_view.get(),
+            'duration_ms': round(duration_ms, 3),
+            'at': timezone.now(),
+        }
+        with self._lock:
+            self.recent.append(entry)
+            self.recorded += 1
+        logger.warning('Slow query (%.1fms) in %s: %s', duration_ms, entry['view'] or '-', entry['sql'][:500])
+        if getattr(settings, 'CORE_SLOW_QUERY_PERSIST', True):
+            pending = self.pending()
+            if len(pending) < self.recent.maxlen:
+                pending.append(entry)
+            if not entry['view']:
+                self.flush_when_committed(alias)
+
+    def flush_when_committed(self, alias):
+        if connections[alias].in_atomic_block:
+            transaction.on_commit(self.flush, using=alias)
+        else:
+            self.flush()
+
+    def pending(self):
+        if not hasattr(self._pending, 'entries'):
+            self._pending.entries = []
+        return self._pending.entries
+
+    def flush(self, **kwargs):
+        # also connected to Celery's task_postrun (core.apps), hence **kwargs
+        entries, self._pending.entries = self.pending(), []
+        if entries:
+            self.persist(entries)
+
+    def persist(self, entries):
+        grouped = {}
+        for entry in entries:
+            group = grouped.setdefault(entry['fingerprint'], {**entry, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            group['calls'] += 1
+            group['total_ms'] += entry['duration_ms']
+            group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        try:
+            with guarded():
+                for key, group in grouped.items():
+                    self._upsert(key, group)
+        except DatabaseError:
+            logger.exception('Could not store slow queries')
+
+    def _upsert(self, key, group):
+        changes = {
+            'calls': F('calls') + group['calls'],
+            'total_ms': F('total_ms') + group['total_ms'],
+            'max_ms': Greatest(F('max_ms'), group['max_ms']),
+            'view': group['view'][:255],
+            'last_seen': timezone.now(),
+        }
+        if group['plan']:
+            changes['plan'] = group['plan']
+        if SlowQuery.objects.filter(fingerprint=key).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                SlowQuery.objects.create(
+                    fingerprint=key, sql=group['sql'], plan=group['plan'], view=group['view'][:255],
+                    calls=group['calls'], total_ms=group['total_ms'], max_ms=group['max_ms'],
+                )
+        except IntegrityError:
+            # another process inserted the fingerprint first
+            SlowQuery.objects.filter(fingerprint=key).update(**changes)
+
+    def trim(self):
+        # keep the table bounded: drop the cheapest fingerprints beyond the limit
+        limit = getattr(settings, 'CORE_SLOW_QUERY_TABLE_SIZE', 500)
+        with guarded():
+            stale_ids = list(SlowQuery.objects.order_by('-total_ms').values_list('id', flat=True)[limit:])
+            if stale_ids:
+                SlowQuery.objects.filter(id__in=stale_ids).delete()
+        return len(stale_ids)
+
+
+recorder = SlowQueryRecorder()
+
+
+def install(sender=None, connection=None, **kwargs):
+    # connection_created fires on every reconnect of the same wrapper, and can fire
+    # inside a connection.execute_wrapper() block whose exit pops the last wrapper,
+    # so the permanent recorder goes first
+    if recorder not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, recorder)
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_view.set(request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            current_view.reset(token)
+            recorder.flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_view.set(route_name(request))
+
+
+def slow_query_metrics():
+    return [Metric('db_slow_queries_total', 'counter', 'Statements over CORE_SLOW_QUERY_MS in this process', [({}, recorder.recorded)])]
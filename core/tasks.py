@@ -0,0 +1,7 @@
+from celery import shared_task
+from core.slow_queries import recorder
+
+
+@shared_task
+def trim_slow_queries():
+    return recorder.trim()
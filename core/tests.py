@@ -1,3 +1,14 @@
-from django.test import TestCase
+from django.test import RequestFactory, SimpleTestCase
+from core.instrumentation import method_label
 
-# Create your tests here.
+
+class MethodLabelTests(SimpleTestCase):
+    def test_known_methods_are_kept(self):
+        for method in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'):
+            with self.subTest(method=method):
+                self.assertEqual(method_label(RequestFactory().generic(method, '/')), method)
+
+    def test_any_other_verb_is_other(self):
+        for method in ('BREW', 'PROPFIND', 'X' * 100):
+            with self.subTest(method=method):
+                self.assertEqual(method_label(RequestFactory().generic(method, '/')), 'other')
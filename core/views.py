@@ -1,3 +1,31 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from core import instrumentation
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return json.dumps(data).encode(self.charset)  # error bodies (401/403)
+
+
+# Prometheus scrape target (staff only). Metrics are per process: with several
+# workers each scrape sees the worker that served it.
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request):
+        return Response(
+            instrumentation.render_prometheus(instrumentation.collect()),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LikesConfig(AppConfig):
     name = 'likes'
+
+    def ready(self) -> None:
+        import likes.signals.handlers
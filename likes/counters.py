@@ -0,0 +1,99 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from likes.models import LikeCounter, LikeItem
+
+
+def adjust(content_type_id, object_id, delta):
+    # single-statement F() update, so concurrent likes of one object never lose an increment
+    counters = LikeCounter.objects.filter(content_type_id=content_type_id, object_id=object_id)
+    if delta < 0:
+        counters.filter(count__gte=-delta).update(count=F('count') + delta)
+        return
+    if counters.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            LikeCounter.objects.create(content_type_id=content_type_id, object_id=object_id, count=delta)
+    except IntegrityError:
+        # another request created the counter first
+        counters.update(count=F('count') + delta)
+
+
+def like(user, content_type, object_id):
+    # True when this call added the like; the post_save handler counts it
+    try:
+        with transaction.atomic():
+            LikeItem.objects.create(user=user, content_type=content_type, object_id=object_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unlike(user, content_type, object_id):
+    # queryset delete still sends post_delete per row, which uncounts it
+    with transaction.atomic():
+        deleted, _ = LikeItem.objects.filter(user=user, content_type=content_type, object_id=object_id).delete()
+    return bool(deleted)
+
+
+def toggle(user, content_type, object_id):
+    # returns whether the object is liked afterwards
+    with transaction.atomic():
+        if unlike(user, content_type, object_id):
+            return False
+        like(user, content_type, object_id)
+    return True
+
+
+def get_count(content_type, object_id):
+    return (
+        LikeCounter.objects.filter(content_type=content_type, object_id=object_id).values_list('count', flat=True).first()
+        or 0
+    )
+
+
+# Like counts and the user's own likes for a page of objects in two queries
+# (one for anonymous users): [{'object_id', 'count', 'liked'}] in the order given.
+def lookup(content_type, object_ids, user=None):
+    counts = dict(
+        LikeCounter.objects.filter(content_type=content_type, object_id__in=object_ids).values_list('object_id', 'count')
+    )
+    liked = set()
+    if user is not None and user.is_authenticated:
+        liked = set(
+            LikeItem.objects.filter(user=user, content_type=content_type, object_id__in=object_ids)
+            .values_list('object_id', flat=True)
+        )
+    return [{'object_id': pk, 'count': counts.get(pk, 0), 'liked': pk in liked} for pk in object_ids]
+
+
+def reconcile_like_counts():
+    # Recomputes every counter from LikeItem: corrects drifted counters in one
+    # UPDATE, creates the missing ones, drops the ones left at zero.
+    # Returns (counters corrected, counters created).
+    live_count = (
+        LikeItem.objects
+        .filter(content_type=OuterRef('content_type'), object_id=OuterRef('object_id'))
+        .order_by()
+        .values('content_type', 'object_id')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    live = Coalesce(Subquery(live_count, output_field=IntegerField()), Value(0))
+    corrected = LikeCounter.objects.exclude(count=live).update(count=live)
+
+    missing = (
+        LikeItem.objects
+        .values('content_type_id', 'object_id')
+        .annotate(total=Count('id'))
+        .filter(~Exists(LikeCounter.objects.filter(content_type=OuterRef('content_type'), object_id=OuterRef('object_id'))))
+        .order_by()
+    )
+    created = LikeCounter.objects.bulk_create(
+        [LikeCounter(content_type_id=row['content_type_id'], object_id=row['object_id'], count=row['total']) for row in missing],
+        batch_size=5000, ignore_conflicts=True,
+    )
+    # a single DELETE ... WHERE count = 0, so a counter incremented meanwhile is kept
+    LikeCounter.objects.filter(count=0).delete()
+    return corrected, len(created)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from likes.counters import reconcile_like_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized LikeCounter table from LikeItem'
+
+    def handle(self, *args, **options):
+        corrected, created = reconcile_like_counts()
+        self.stdout.write(self.style.SUCCESS(f'{corrected} like counters corrected, {created} created'))
@@ -0,0 +1,65 @@
+# Generated by Django 6.0 on 2026-10-17 17:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    # keep the oldest like of every (user, object) so the unique constraint can be added
+    LikeItem = apps.get_model('likes', 'LikeItem')
+    duplicates = (
+        LikeItem.objects.values('user_id', 'content_type_id', 'object_id')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for row in list(duplicates):
+        LikeItem.objects.filter(
+            user_id=row['user_id'], content_type_id=row['content_type_id'], object_id=row['object_id'],
+        ).exclude(pk=row['keep']).delete()
+
+
+def populate_counters(apps, schema_editor):
+    LikeItem = apps.get_model('likes', 'LikeItem')
+    LikeCounter = apps.get_model('likes', 'LikeCounter')
+    totals = LikeItem.objects.values('content_type_id', 'object_id').annotate(total=Count('id')).order_by()
+    LikeCounter.objects.bulk_create(
+        (LikeCounter(content_type_id=row['content_type_id'], object_id=row['object_id'], count=row['total']) for row in totals.iterator()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('likes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='likeitem',
+            constraint=models.UniqueConstraint(fields=('user', 'content_type', 'object_id'), name='likes_item_unique_user_object'),
+        ),
+        migrations.AddIndex(
+            model_name='likeitem',
+            index=models.Index(fields=['content_type', 'object_id'], name='likes_item_object_idx'),
+        ),
+        migrations.CreateModel(
+            name='LikeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id'), name='likes_counter_unique_object')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -11,3 +11,27 @@ class LikeItem(models.Model):
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
 
+    class Meta:
+        constraints = [
+            # a user likes an object once; also serves "which of these did I like" lookups
+            models.UniqueConstraint(fields=['user', 'content_type', 'object_id'], name='likes_item_unique_user_object'),
+        ]
+        indexes = [
+            # likes of an object, for reconciling LikeCounter
+            models.Index(fields=['content_type', 'object_id'], name='likes_item_object_idx'),
+        ]
+
+
+# Denormalized number of LikeItems per object, kept in step by the LikeItem
+# signal handlers with F() increments and reconciled periodically
+# (likes.counters.reconcile_like_counts) for bulk writes that skip signals.
+class LikeCounter(models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='likes_counter_unique_object'),
+        ]
+
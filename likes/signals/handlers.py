@@ -0,0 +1,16 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+from likes.counters import adjust
+from likes.models import LikeItem
+
+
+# Denormalized LikeCounter; bulk writes skip these, reconcile_like_counts catches up
+@receiver(post_save, sender=LikeItem)
+def count_saved_like(sender, instance, created, **kwargs):
+    if created:
+        adjust(instance.content_type_id, instance.object_id, 1)
+
+
+@receiver(post_delete, sender=LikeItem)
+def count_deleted_like(sender, instance, **kwargs):
+    adjust(instance.content_type_id, instance.object_id, -1)
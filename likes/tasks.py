@@ -0,0 +1,8 @@
+from celery import shared_task
+from likes.counters import reconcile_like_counts
+
+
+@shared_task
+def reconcile_like_counters():
+    corrected, created = reconcile_like_counts()
+    return {'corrected': corrected, 'created': created}
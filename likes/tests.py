@@ -1,3 +1,78 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
+from likes import counters
+from likes.models import LikeCounter, LikeItem
+from store.models import Collection, Product
+
+
+class LikeCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.users = [
+            user_model.objects.create_user(username=f'user{n}', email=f'user{n}@example.com', password='secret-pass')
+            for n in range(3)
+        ]
+        collection = Collection.objects.create(title='Tools')
+        cls.products = [
+            Product.objects.create(title=f'Product {n}', description='', price=Decimal('10.00'), inventory=10, collection=collection)
+            for n in range(2)
+        ]
+        cls.content_type = ContentType.objects.get_for_model(Product)
+
+    def count(self, product):
+        return counters.get_count(self.content_type, product.pk)
+
+    def test_like_and_unlike_keep_the_counter(self):
+        product = self.products[0]
+        for user in self.users:
+            self.assertTrue(counters.like(user, self.content_type, product.pk))
+        # liking twice is a no-op
+        self.assertFalse(counters.like(self.users[0], self.content_type, product.pk))
+        self.assertEqual(self.count(product), 3)
+
+        self.assertTrue(counters.unlike(self.users[0], self.content_type, product.pk))
+        self.assertFalse(counters.unlike(self.users[0], self.content_type, product.pk))
+        self.assertEqual(self.count(product), 2)
+
+    def test_toggle(self):
+        product = self.products[0]
+        self.assertTrue(counters.toggle(self.users[0], self.content_type, product.pk))
+        self.assertEqual(self.count(product), 1)
+        self.assertFalse(counters.toggle(self.users[0], self.content_type, product.pk))
+        self.assertEqual(self.count(product), 0)
+
+    def test_counter_never_goes_negative(self):
+        counters.adjust(self.content_type.pk, self.products[0].pk, -1)
+        self.assertEqual(self.count(self.products[0]), 0)
+
+    def test_lookup(self):
+        first, second = self.products
+        counters.like(self.users[0], self.content_type, first.pk)
+        counters.like(self.users[1], self.content_type, first.pk)
+        with self.assertNumQueries(2):
+            rows = counters.lookup(self.content_type, [second.pk, first.pk], self.users[0])
+        self.assertEqual(rows, [
+            {'object_id': second.pk, 'count': 0, 'liked': False},
+            {'object_id': first.pk, 'count': 2, 'liked': True},
+        ])
+
+    def test_reconcile_fixes_drifted_missing_and_empty_counters(self):
+        first, second = self.products
+        counters.like(self.users[0], self.content_type, first.pk)
+        # bulk writes send no signals: second gets likes but no counter
+        LikeItem.objects.bulk_create([
+            LikeItem(user=user, content_type=self.content_type, object_id=second.pk) for user in self.users
+        ])
+        LikeCounter.objects.filter(object_id=first.pk).update(count=7)
+        LikeCounter.objects.create(content_type=self.content_type, object_id=999, count=4)
 
-# Create your tests here.
+        corrected, created = counters.reconcile_like_counts()
+        self.assertEqual((corrected, created), (2, 1))
+        self.assertEqual(
+            dict(LikeCounter.objects.values_list('object_id', 'count')),
+            {first.pk: 1, second.pk: 3},
+        )
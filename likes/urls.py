@@ -1,5 +1,7 @@
 from django.urls import path
-from .views import firstlike
+from .views import firstlike, LikeLookupView, LikeView
 urlpatterns = [
-    path('firstlike/', firstlike)
+    path('firstlike/', firstlike),
+    path('<str:model>/', LikeLookupView.as_view()),
+    path('<str:model>/<int:object_id>/', LikeView.as_view()),
 ]
@@ -1,6 +1,82 @@
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.shortcuts import render
 from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from likes import counters
 # Create your views here.
 
 def firstlike(request):
-    return HttpResponse('i am from the likes')
\ No newline at end of file
+    return HttpResponse('i am from the likes')
+
+
+def likeable_model(label):
+    # only models listed in LIKES_MODELS ("app_label.model_name") can be liked
+    label = label.lower()
+    if label not in [name.lower() for name in getattr(settings, 'LIKES_MODELS', [])]:
+        raise NotFound(f'"{label}" cannot be liked')
+    return apps.get_model(label)
+
+
+class LikeAPIView(APIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_content_type(self):
+        return ContentType.objects.get_for_model(likeable_model(self.kwargs['model']))
+
+
+# like state of one object ---> likes/store.product/{id}/
+# GET: count and whether the current user likes it; PUT likes, DELETE unlikes
+# (both idempotent), POST toggles
+class LikeView(LikeAPIView):
+    def get_object_content_type(self):
+        content_type = self.get_content_type()
+        if not content_type.model_class()._default_manager.filter(pk=self.kwargs['object_id']).exists():
+            raise NotFound('No object with given id was found')
+        return content_type
+
+    def state(self, content_type, liked=None):
+        object_id = self.kwargs['object_id']
+        if liked is None:
+            return counters.lookup(content_type, [object_id], self.request.user)[0]
+        return {'object_id': object_id, 'count': counters.get_count(content_type, object_id), 'liked': liked}
+
+    def get(self, request, model, object_id):
+        return Response(self.state(self.get_content_type()))
+
+    def put(self, request, model, object_id):
+        content_type = self.get_object_content_type()
+        created = counters.like(request.user, content_type, object_id)
+        return Response(self.state(content_type, True), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def delete(self, request, model, object_id):
+        content_type = self.get_content_type()
+        counters.unlike(request.user, content_type, object_id)
+        return Response(self.state(content_type, False))
+
+    def post(self, request, model, object_id):
+        content_type = self.get_object_content_type()
+        return Response(self.state(content_type, counters.toggle(request.user, content_type, object_id)))
+
+
+# counts and the current user's likes for a page ---> likes/store.product/?ids=1,2,3
+# [{"object_id", "count", "liked"}] in the order asked, in two queries
+class LikeLookupView(LikeAPIView):
+    max_ids = 100
+
+    def get(self, request, model):
+        values = [part for value in request.query_params.getlist('ids') for part in value.split(',') if part.strip()]
+        try:
+            object_ids = list(dict.fromkeys(int(value) for value in values))
+        except ValueError:
+            raise ValidationError({'ids': ['Expected object ids separated by commas.']})
+        if len(object_ids) > self.max_ids:
+            raise ValidationError({'ids': [f'At most {self.max_ids} ids per request.']})
+        if not object_ids:
+            return Response([])
+        return Response(counters.lookup(self.get_content_type(), object_ids, request.user))
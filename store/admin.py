@@ -1,4 +1,5 @@
 from django.contrib import admin, messages
+from django.core.files.storage import default_storage
 from django.db.models import Count
 from django.utils.html import format_html, urlencode
 from django.urls import reverse
@@ -12,6 +13,9 @@ class ProductImageInline(admin.TabularInline):
     max_num = 10
 
     def thumbnail(self, instance):
+        # the smallest generated variant; the original until the worker has produced them
+        if instance.variants:
+            return format_html('<img src="{}" style="width: 50px; height:auto;">', default_storage.url(instance.variants[0]['name']))
         if instance.image.name != "":
             return format_html('<img src="{}" style="width: 50px; height:auto;">', instance.image.url)
         return ""
@@ -97,7 +101,7 @@ class CollectionAdmin(admin.ModelAdmin):
     list_per_page = 10
     search_fields = ['title__istartswith']
 
-    @admin.display(ordering='products_count')   
+    @admin.display(ordering='annotated_products_count')   
     def products_count(self, collection):
         url = (
             reverse('admin:store_product_changelist')
@@ -105,11 +109,11 @@ class CollectionAdmin(admin.ModelAdmin):
                 + urlencode({
                     'collection__id': str(collection.id)
                     }))
-        return format_html('<a href="{}">{}</a>', url, collection.products_count)
+        return format_html('<a href="{}">{}</a>', url, collection.annotated_products_count)
         
     
     def get_queryset(self, request):
         return super().get_queryset(request).annotate(
-            products_count=Count('products')
+            annotated_products_count=Count('products')
         )
 
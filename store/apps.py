@@ -5,4 +5,15 @@ class StoreConfig(AppConfig):
     name = 'store'
 
     def ready(self) -> None:
-        import store.signals.handlers
\ No newline at end of file
+        import store.signals.handlers
+        from django.core import checks
+        from store import idempotency
+        checks.register(idempotency.check_cache_backend, checks.Tags.caches)
+        from core.instrumentation import register_collector
+        from store import metrics
+        register_collector(metrics.catalog_cache_metrics)
+        register_collector(metrics.outbox_metrics)
+        from django.core.signals import request_started
+        from store import autocomplete
+        # builds the autocomplete index in the background as soon as the process serves anything
+        request_started.connect(autocomplete.warm_on_request, dispatch_uid='store.autocomplete.warm')
@@ -0,0 +1,240 @@
+import bisect
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from store import cache as catalog_cache
+from store.models import Collection, Product
+
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+')
+MAX_KEY_LENGTH = 32
+MAX_WORDS = 6
+
+PRODUCT = 'products'
+COLLECTION = 'collections'
+
+
+def title_keys(title):
+    # one key per word start so "mou" finds "Wireless Mouse", cut short to bound memory
+    normalized = (title or '').lower()
+    starts = [match.start() for match in WORD_RE.finditer(normalized)][:MAX_WORDS]
+    return sorted({normalized[start:start + MAX_KEY_LENGTH] for start in starts})
+
+
+# Changes are shared between processes as a numbered log in the catalog cache:
+# CHANGE_SEQ_KEY counts them, CHANGE_KEY.format(n) holds (kind, id, title or None).
+CHANGE_SEQ_KEY = 'autocomplete:seq'
+CHANGE_KEY = 'autocomplete:change:{}'
+CHANGE_TTL = 60 * 60  # seconds a change stays readable by lagging processes
+MAX_CHANGES_PER_SYNC = 1000  # further behind than this, a rebuild is cheaper
+
+
+def current_seq():
+    return catalog_cache.get_version(CHANGE_SEQ_KEY)
+
+
+def publish_change(kind, pk, title):
+    # returns the change's sequence number
+    cache = catalog_cache.get_cache()
+    try:
+        seq = cache.incr(CHANGE_SEQ_KEY)
+    except ValueError:
+        current_seq()  # evicted: restarts past any number already handed out
+        seq = cache.incr(CHANGE_SEQ_KEY)
+    cache.set(CHANGE_KEY.format(seq), (kind, pk, title), CHANGE_TTL)
+    return seq
+
+
+def mark_stale():
+    # for bulk writes that skip the signal handlers (imports, fixtures): jumping the
+    # counter past MAX_CHANGES_PER_SYNC makes every process rebuild in the background
+    cache = catalog_cache.get_cache()
+    try:
+        cache.incr(CHANGE_SEQ_KEY, MAX_CHANGES_PER_SYNC + 1)
+    except ValueError:
+        current_seq()
+        cache.incr(CHANGE_SEQ_KEY, MAX_CHANGES_PER_SYNC + 1)
+
+
+# In-process prefix index over product and collection titles: one sorted list of
+# (key, id) tuples per kind, searched with bisect. It is built in a background
+# thread, lookups before that find nothing. Committed title changes are
+# applied locally right away and published to the change log; every few seconds
+# a lookup replays the changes other processes published since. Only when the
+# log cannot be replayed (too far behind, entries expired) is the index rebuilt,
+# in a background thread while the current one keeps serving.
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._keys = {PRODUCT: [], COLLECTION: []}
+        self._titles = {PRODUCT: {}, COLLECTION: {}}
+        self._built = False
+        self._rebuilding = False
+        self._version = None  # last change applied, every earlier one included
+        self._checked_at = 0.0
+        self._stalled_since = None
+
+    def build(self):
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        keys = {PRODUCT: [], COLLECTION: []}
+        titles = {PRODUCT: {}, COLLECTION: {}}
+        # read first: changes published during the scan are replayed on top of it
+        version = current_seq()
+        sources = (
+            (PRODUCT, Product.objects.values_list('id', 'title').order_by().iterator(chunk_size=5000)),
+            (COLLECTION, Collection.objects.values_list('id', 'title').order_by().iterator(chunk_size=5000)),
+        )
+        for kind, rows in sources:
+            for pk, title in rows:
+                titles[kind][pk] = title
+                keys[kind].extend((key, pk) for key in title_keys(title))
+            keys[kind].sort()
+        with self._lock:
+            self._keys, self._titles = keys, titles
+            self._built, self._version = True, version
+            self._checked_at, self._stalled_since = time.monotonic(), None
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                self.build()
+            except Exception:
+                logger.exception('Rebuilding the autocomplete index failed')
+            finally:
+                connections.close_all()  # this thread's own connections
+                with self._lock:
+                    self._rebuilding = False
+
+        threading.Thread(target=run, name='autocomplete-rebuild', daemon=True).start()
+
+    def warm(self):
+        # started on a process's first request (StoreConfig.ready), so the index is
+        # usually ready before the first lookup
+        if not self._built:
+            self._rebuild_in_background()
+
+    def _ensure_fresh(self):
+        if not self._built:
+            # a full scan never runs on the request path: lookups answer empty until it is done
+            self._rebuild_in_background()
+            return
+        interval = getattr(settings, 'STORE_AUTOCOMPLETE_SYNC_SECONDS', 5)
+        # one thread syncs, the others serve the index as it is
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._checked_at < interval:
+                return
+            self._checked_at = time.monotonic()
+            self._replay(current_seq(), interval)
+        finally:
+            self._sync_lock.release()
+
+    def _replay(self, latest, interval):
+        with self._lock:
+            version = self._version
+        if latest == version or self._rebuilding:
+            return
+        if latest < version or latest - version > MAX_CHANGES_PER_SYNC:
+            # the counter was evicted and restarted, or this process fell too far behind
+            self._rebuild_in_background()
+            return
+        seqs = range(version + 1, latest + 1)
+        found = catalog_cache.get_cache().get_many([CHANGE_KEY.format(seq) for seq in seqs])
+        with self._lock:
+            for seq in seqs:
+                if seq <= self._version:
+                    continue  # applied meanwhile by this process itself
+                change = found.get(CHANGE_KEY.format(seq))
+                if change is None:
+                    break
+                self._apply(*change)
+                self._version = seq
+            caught_up = self._version == latest
+        if caught_up:
+            self._stalled_since = None
+            return
+        # a gap is normally a change whose number is taken but whose entry is not written yet;
+        # one that stays missing has expired or was evicted
+        if self._stalled_since is None:
+            self._stalled_since = time.monotonic()
+        elif time.monotonic() - self._stalled_since > 2 * interval:
+            self._rebuild_in_background()
+
+    def _apply(self, kind, pk, title):
+        self._discard(kind, pk)
+        if title is not None:
+            self._titles[kind][pk] = title
+            for key in title_keys(title):
+                bisect.insort(self._keys[kind], (key, pk))
+
+    def _record(self, kind, pk, title):
+        # called once the change is committed (see the signal handlers)
+        seq = publish_change(kind, pk, title)
+        with self._lock:
+            if not self._built:
+                return
+            self._apply(kind, pk, title)
+            # only a change right after the last one applied keeps the index current;
+            # otherwise other processes' changes in between are still to be replayed
+            if seq == self._version + 1:
+                self._version = seq
+
+    def add(self, kind, pk, title):
+        self._record(kind, pk, title)
+
+    def remove(self, kind, pk):
+        self._record(kind, pk, None)
+
+    def _discard(self, kind, pk):
+        title = self._titles[kind].pop(pk, None)
+        if title is None:
+            return
+        keys = self._keys[kind]
+        for key in title_keys(title):
+            position = bisect.bisect_left(keys, (key, pk))
+            if position < len(keys) and keys[position] == (key, pk):
+                del keys[position]
+
+    def lookup(self, prefix, limit=10):
+        prefix = prefix.strip().lower()[:MAX_KEY_LENGTH]
+        results = {PRODUCT: [], COLLECTION: []}
+        if not prefix:
+            return results
+        self._ensure_fresh()
+        with self._lock:
+            for kind, keys in self._keys.items():
+                titles, seen = self._titles[kind], set()
+                position = bisect.bisect_left(keys, (prefix,))
+                while position < len(keys) and len(seen) < limit:
+                    key, pk = keys[position]
+                    if not key.startswith(prefix):
+                        break
+                    if pk not in seen:
+                        seen.add(pk)
+                        results[kind].append({'id': pk, 'title': titles[pk]})
+                    position += 1
+        return results
+
+
+index = PrefixIndex()
+
+
+def warm_on_request(sender, **kwargs):
+    index.warm()
@@ -0,0 +1,332 @@
+import datetime
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.db.models import Max, Prefetch
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import AccessToken
+from core.renderers import FastJSONParser, FastJSONRenderer
+from store import cache as catalog_cache
+from store.carts import get_cart_store
+from store.fast_reads import ROW_COLUMNS, ProductReader
+from store.models import Collection, Order, OrderItem, Product
+from store.serializers import OrderSerializer, ProductSerializer
+
+
+ANONYMOUS, CUSTOMER, STAFF = 'anonymous', 'customer', 'staff'
+
+
+# One endpoint call. path/data are callables of the context so scenarios can
+# use ids sampled from whatever dataset is loaded; prepare() runs untimed
+# before every call (e.g. to fill a cart that the timed request checks out).
+class Scenario:
+    def __init__(self, name, path, method='GET', user=ANONYMOUS, data=None, prepare=None, write=False):
+        self.name, self.path, self.method, self.user = name, path, method, user
+        self.data, self.prepare, self.write = data, prepare, write
+
+
+def fill_cart(context):
+    store = get_cart_store()
+    cart = store.create_cart()
+    store.add_items(cart.pk, [(context['stocked_product_id'], 1)])
+    context['checkout_cart_id'] = cart.pk
+
+
+SCENARIOS = [
+    Scenario('products-list', lambda c: '/store/products/'),
+    Scenario('products-keyset', lambda c: '/store/products/?paginate=keyset&ordering=price'),
+    Scenario('products-filter', lambda c: f'/store/products/?collection_id={c["collection_id"]}'),
+    Scenario('products-search', lambda c: '/store/products/?search=wireless'),
+    Scenario('product-detail', lambda c: f'/store/products/{c["product_id"]}/'),
+    Scenario('product-reviews', lambda c: f'/store/products/{c["product_id"]}/reviews/'),
+    Scenario('product-images', lambda c: f'/store/products/{c["product_id"]}/images/'),
+    Scenario('collections-list', lambda c: '/store/collections/'),
+    Scenario('collection-detail', lambda c: f'/store/collections/{c["collection_id"]}/'),
+    Scenario('autocomplete', lambda c: '/store/autocomplete/?q=wi'),
+    Scenario('cart-create', lambda c: '/store/carts/', method='POST', data=lambda c: {}, write=True),
+    Scenario('cart-detail', lambda c: f'/store/carts/{c["cart_id"]}/'),
+    Scenario(
+        'cart-items-add', lambda c: f'/store/carts/{c["cart_id"]}/items/', method='POST',
+        data=lambda c: {'product_id': c['product_id'], 'quantity': 1}, write=True,
+    ),
+    Scenario('customers-me', lambda c: '/store/customers/me/', user=CUSTOMER),
+    Scenario('customers-list', lambda c: '/store/customers/', user=STAFF),
+    Scenario('orders-list', lambda c: '/store/orders/', user=CUSTOMER),
+    Scenario('orders-summary', lambda c: '/store/orders/?view=summary', user=CUSTOMER),
+    Scenario('orders-list-staff', lambda c: '/store/orders/?paginate=keyset', user=STAFF),
+    Scenario('order-detail', lambda c: f'/store/orders/{c["order_id"]}/', user=CUSTOMER),
+    Scenario('orders-export', lambda c: f'/store/orders/export/?placed_after={c["export_since"]}', user=STAFF),
+    Scenario(
+        'order-create', lambda c: '/store/orders/', method='POST', user=CUSTOMER,
+        data=lambda c: {'cart_id': c['checkout_cart_id']}, prepare=fill_cart, write=True,
+    ),
+]
+
+
+def percentile(sorted_samples, fraction):
+    # nearest-rank, so p99 of 100 samples is the 99th slowest rather than an interpolation
+    if not sorted_samples:
+        return None
+    rank = max(int(round(fraction * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+def summarize(latencies, queries, statuses, elapsed):
+    ordered = sorted(latencies)
+    to_ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        'requests': len(latencies),
+        'p50_ms': to_ms(percentile(ordered, 0.50)),
+        'p95_ms': to_ms(percentile(ordered, 0.95)),
+        'p99_ms': to_ms(percentile(ordered, 0.99)),
+        'mean_ms': to_ms(statistics.fmean(ordered)) if ordered else None,
+        'max_ms': to_ms(ordered[-1]) if ordered else None,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'queries_avg': round(statistics.fmean(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+        'status_codes': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_user(username, **extra):
+    user_model = get_user_model()
+    user = user_model.objects.filter(username=username).first()
+    if user is None:
+        # create_user goes through save(), so the customer row is created by the signal handler
+        user = user_model.objects.create_user(username=username, email=f'{username}@example.com', **extra)
+    return user
+
+
+def build_context():
+    product = Product.objects.order_by('-id').values('id', 'collection_id').first()
+    if product is None:
+        raise ValueError('no products loaded; run generate_fixtures first')
+    stocked = Product.objects.order_by('-inventory').values_list('id', flat=True).first()
+    # the newest order's owner has order history for the customer scenarios
+    latest_order = Order.objects.order_by('-id').values('id', 'customer__user_id').first()
+    latest_placed = Order.objects.aggregate(value=Max('placed_at'))['value'] or timezone.now()
+    if latest_order:
+        customer = get_user_model().objects.get(pk=latest_order['customer__user_id'])
+    else:
+        customer = bench_user('bench-api-customer')
+    cart = get_cart_store().create_cart()
+    return {
+        'product_id': product['id'],
+        'stocked_product_id': stocked,
+        'collection_id': product['collection_id'] or Collection.objects.values_list('id', flat=True).first(),
+        'order_id': latest_order['id'] if latest_order else 0,
+        'cart_id': cart.pk,
+        # the last day of orders; fixture dates end at synthetic.BASE_TIME, not today
+        'export_since': (latest_placed - datetime.timedelta(days=1)).date().isoformat(),
+        'users': {
+            CUSTOMER: customer,
+            STAFF: bench_user('bench-api-staff', is_staff=True),
+        },
+    }
+
+
+class Runner:
+    # write scenarios leave carts, orders and reduced inventory behind, so they are opt-in.
+    # Every timed request repeats the same GET: with the catalog cache on, all but the
+    # first are cache hits, so it is off unless use_cache asks for it.
+    def __init__(self, requests=50, warmup=5, include_writes=False, only=None, use_cache=False):
+        self.requests, self.warmup = requests, warmup
+        self.include_writes, self.only = include_writes, set(only or [])
+        self.use_cache = use_cache
+
+    def scenarios(self):
+        for scenario in SCENARIOS:
+            if self.only and scenario.name not in self.only:
+                continue
+            if scenario.write and not self.include_writes:
+                continue
+            yield scenario
+
+    def client_for(self, scenario, context):
+        user = context['users'].get(scenario.user)
+        # server errors are recorded as status codes instead of aborting the run
+        if user is None:
+            return Client(raise_request_exception=False)
+        return Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}')
+
+    def call(self, client, scenario, context):
+        if scenario.prepare:
+            scenario.prepare(context)
+        path = scenario.path(context)
+        data = scenario.data(context) if scenario.data else None
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            if scenario.method == 'GET':
+                response = client.get(path)
+            else:
+                response = client.generic(scenario.method, path, json.dumps(data or {}), content_type='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return elapsed, len(captured), response.status_code
+
+    def run_scenario(self, scenario, context):
+        client = self.client_for(scenario, context)
+        for _ in range(self.warmup):
+            self.call(client, scenario, context)
+        latencies, queries, statuses = [], [], []
+        hits_before = catalog_cache.stats()['hits']
+        started = time.perf_counter()
+        for _ in range(self.requests):
+            elapsed, count, status = self.call(client, scenario, context)
+            latencies.append(elapsed)
+            queries.append(count)
+            statuses.append(status)
+        result = summarize(latencies, queries, statuses, time.perf_counter() - started)
+        # timed requests answered from the catalog cache
+        result['cache_hits'] = catalog_cache.stats()['hits'] - hits_before
+        return result
+
+    def run(self, progress=None):
+        context = build_context()
+        results = {}
+        try:
+            with override_settings(STORE_CATALOG_CACHE_ENABLED=self.use_cache):
+                for scenario in self.scenarios():
+                    results[scenario.name] = self.run_scenario(scenario, context)
+                    if progress is not None:
+                        progress(scenario.name, results[scenario.name])
+        finally:
+            # the cart the read scenarios look at
+            get_cart_store().delete_cart(context['cart_id'])
+        return {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'git_revision': git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'requests_per_endpoint': self.requests,
+                'warmup_per_endpoint': self.warmup,
+                'writes': self.include_writes,
+                'catalog_cache': self.use_cache,
+                'products': Product.objects.count(),
+            },
+            'endpoints': results,
+        }
+
+
+def compare(baseline, current, metric='p95_ms'):
+    # (endpoint, before, after, relative change) for endpoints present in both reports
+    rows = []
+    for name, result in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name, {}).get(metric)
+        after = result.get(metric)
+        if before and after is not None:
+            rows.append((name, before, after, (after - before) / before))
+    return rows
+
+
+# ProductSerializer against the compiled ProductReader (store/fast_reads.py) on
+# the same products: each round loads the rows and builds the representation,
+# as a catalog cache miss does. Both outputs are rendered to JSON and compared.
+class SerializerBenchmark:
+    def __init__(self, rows=100, rounds=50, warmup=5):
+        self.rows, self.rounds, self.warmup = rows, rounds, warmup
+        self.request = Request(RequestFactory().get('/store/products/'))
+
+    def product_ids(self):
+        ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:self.rows])
+        if not ids:
+            raise ValueError('no products loaded; run generate_fixtures first')
+        return ids
+
+    def serializer(self, ids):
+        products = Product.objects.filter(pk__in=ids).order_by('id').prefetch_related('images')
+        return ProductSerializer(products, many=True, context={'request': self.request}).data
+
+    def reader(self, ids):
+        names, _ = ProductSerializer.select_fields(self.request.query_params)
+        rows = list(Product.objects.filter(pk__in=ids).order_by('id').values(*ROW_COLUMNS))
+        return ProductReader(self.request, names).render(rows)
+
+    def measure(self, build, ids):
+        for _ in range(self.warmup):
+            build(ids)
+        started = time.perf_counter()
+        for _ in range(self.rounds):
+            build(ids)
+        elapsed = time.perf_counter() - started
+        return {'rows_per_second': round(len(ids) * self.rounds / elapsed, 1), 'ms_per_page': round(elapsed * 1000 / self.rounds, 3)}
+
+    def run(self):
+        ids = self.product_ids()
+        renderer = JSONRenderer()
+        before = self.measure(self.serializer, ids)
+        after = self.measure(self.reader, ids)
+        return {
+            'rows': len(ids),
+            'rounds': self.rounds,
+            'serializer': before,
+            'fast_reader': after,
+            'speedup': round(after['rows_per_second'] / before['rows_per_second'], 2),
+            'identical': renderer.render(self.serializer(ids)) == renderer.render(self.reader(ids)),
+        }
+
+
+# DRF's stdlib JSONRenderer/JSONParser against core.renderers' orjson pair on
+# large product and order pages. The pages are serialized once up front, so
+# only encoding and decoding are timed; every page must render the same bytes.
+class JSONBenchmark:
+    def __init__(self, rows=1000, rounds=20):
+        self.rows, self.rounds = rows, rounds
+        self.request = Request(RequestFactory().get('/store/products/'))
+
+    def pages(self):
+        products = Product.objects.order_by('id').prefetch_related('images')[:self.rows]
+        orders = Order.objects.order_by('-id').prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )[:self.rows]
+        pages = {
+            'products': ProductSerializer(products, many=True, context={'request': self.request}).data,
+            'orders': OrderSerializer(orders, many=True, context={'request': self.request}).data,
+        }
+        if not pages['products']:
+            raise ValueError('no products loaded; run generate_fixtures first')
+        return {name: data for name, data in pages.items() if data}
+
+    def measure(self, call):
+        call()
+        started = time.perf_counter()
+        for _ in range(self.rounds):
+            call()
+        return round((time.perf_counter() - started) * 1000 / self.rounds, 3)
+
+    def run_page(self, data):
+        renderers = {'stdlib': JSONRenderer(), 'orjson': FastJSONRenderer()}
+        parsers = {'stdlib': JSONParser(), 'orjson': FastJSONParser()}
+        body = renderers['stdlib'].render(data)
+        result = {'rows': len(data), 'bytes': len(body), 'identical': renderers['orjson'].render(data) == body}
+        for name in renderers:
+            result[f'render_ms_{name}'] = self.measure(lambda: renderers[name].render(data))
+            result[f'parse_ms_{name}'] = self.measure(lambda: parsers[name].parse(io.BytesIO(body)))
+        result['render_speedup'] = round(result['render_ms_stdlib'] / result['render_ms_orjson'], 2)
+        result['parse_speedup'] = round(result['parse_ms_stdlib'] / result['parse_ms_orjson'], 2)
+        return result
+
+    def run(self):
+        return {name: self.run_page(data) for name, data in self.pages().items()}
@@ -0,0 +1,160 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+
+# Catalog responses are cached under keys that embed a version counter.
+# Writes never delete cached pages, they bump the counter so every key built
+# from the old version simply stops being looked up and ages out of the cache.
+GLOBAL_VERSION_KEY = 'catalog:version:global'
+COLLECTION_VERSION_KEY = 'catalog:version:collection:{}'
+REVIEW_VERSION_KEY = 'catalog:version:reviews:{}'
+
+BYPASS_PARAM = 'nocache'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'STORE_CATALOG_CACHE_ALIAS', 'default')]
+
+
+def is_enabled():
+    return getattr(settings, 'STORE_CATALOG_CACHE_ENABLED', True)
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def stats():
+    with _stats_lock:
+        counters = {name: _stats[name] for name in ('hits', 'misses', 'bypasses', 'invalidations')}
+    lookups = counters['hits'] + counters['misses']
+    counters['hit_ratio'] = round(counters['hits'] / lookups, 4) if lookups else 0.0
+    return counters
+
+
+def collection_version_key(collection_id):
+    return COLLECTION_VERSION_KEY.format(collection_id)
+
+
+def review_version_key(product_id):
+    return REVIEW_VERSION_KEY.format(product_id)
+
+
+def _initial_version():
+    # a counter that was evicted must never restart at a value an older key already used
+    return int(time.time() * 1000)
+
+
+def get_versions(*keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def get_version(key):
+    return get_versions(key)[key]
+
+
+def bump_version(*keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), timeout=None)
+        _count('invalidations')
+
+
+def invalidate(collection_ids=()):
+    keys = [GLOBAL_VERSION_KEY]
+    keys += [collection_version_key(pk) for pk in set(collection_ids) if pk is not None]
+    bump_version(*keys)
+
+
+def normalize_params(query_params):
+    items = sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        if key != BYPASS_PARAM
+        for value in values
+    )
+    return urlencode(items)
+
+
+def should_bypass(request):
+    if request.method not in ('GET', 'HEAD'):
+        return True
+    if request.query_params.get(BYPASS_PARAM) in ('1', 'true', 'yes'):
+        return True
+    return 'no-cache' in request.headers.get('Cache-Control', '')
+
+
+# Serves list/retrieve from the catalog cache.
+# List pages filtered by a single collection_id only depend on that collection's
+# version, everything else (detail pages included) depends on the global version.
+class CatalogCacheMixin:
+    catalog_cache_timeout = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, 'list', lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, 'retrieve', lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs))
+
+    def get_catalog_version_key(self, request, action):
+        collection_ids = request.query_params.getlist('collection_id')
+        if action == 'list' and len(collection_ids) == 1:
+            return collection_version_key(collection_ids[0])
+        return GLOBAL_VERSION_KEY
+
+    def get_catalog_cache_key(self, request, action):
+        version = get_version(self.get_catalog_version_key(request, action))
+        # absolute urls in the payload (pagination links, images) depend on scheme and host
+        fingerprint = '|'.join([
+            request.build_absolute_uri('/'),
+            str(self.kwargs.get('pk', '')),
+            normalize_params(request.query_params),
+            # set by ConditionalGetMixin, keeps cached bodies in step with the ETag
+            str(getattr(request, 'catalog_validator', '')),
+        ])
+        digest = hashlib.sha1(fingerprint.encode()).hexdigest()
+        return f'catalog:{self.basename}:{action}:{version}:{digest}'
+
+    def cached_response(self, request, action, build_response):
+        if not is_enabled() or should_bypass(request):
+            _count('bypasses')
+            response = build_response()
+            response['X-Catalog-Cache'] = 'BYPASS'
+            return response
+
+        cache = get_cache()
+        key = self.get_catalog_cache_key(request, action)
+        data = cache.get(key)
+        if data is not None:
+            _count('hits')
+            response = Response(data)
+            response['X-Catalog-Cache'] = 'HIT'
+            return response
+
+        _count('misses')
+        response = build_response()
+        if response.status_code == 200:
+            timeout = self.catalog_cache_timeout or getattr(settings, 'STORE_CATALOG_CACHE_TIMEOUT', 300)
+            cache.set(key, response.data, timeout)
+        response['X-Catalog-Cache'] = 'MISS'
+        return response
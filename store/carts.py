@@ -0,0 +1,513 @@
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+from store.models import Cart, CartItem, Product, generate_uuid_hex
+
+
+# Cart storage backends.
+# Every backend hands out Cart / CartItem instances so CartSerializer and
+# CartItemSerializer work unchanged. Only DatabaseCartStore persists them, the
+# others build unsaved instances and the data only reaches the database as
+# order items at checkout (CreateOrderSerializer.save via get_lines()).
+class BaseCartStore:
+    # whether writes take part in the surrounding database transaction
+    transactional = False
+
+    def create_cart(self):
+        raise NotImplementedError
+
+    def get_cart(self, cart_id):
+        raise NotImplementedError
+
+    def delete_cart(self, cart_id):
+        raise NotImplementedError
+
+    def list_items(self, cart_id):
+        raise NotImplementedError
+
+    def get_item(self, cart_id, item_id):
+        raise NotImplementedError
+
+    def add_item(self, cart_id, product_id, quantity):
+        raise NotImplementedError
+
+    # adds several lines at once, returns the resulting items or None when the cart does not exist
+    def add_items(self, cart_id, lines):
+        items = []
+        for product_id, quantity in merge_lines(lines):
+            cart_item = self.add_item(cart_id, product_id, quantity)
+            if cart_item is None:
+                return None
+            items.append(cart_item)
+        return items
+
+    def update_item(self, cart_id, item_id, quantity):
+        raise NotImplementedError
+
+    def remove_item(self, cart_id, item_id):
+        raise NotImplementedError
+
+    # [(product_id, quantity), ...] or None when the cart does not exist
+    def get_lines(self, cart_id):
+        raise NotImplementedError
+
+    # Checkout on a store outside the database transaction: takes the cart out of
+    # reach in one atomic step and returns its lines, or None when it is gone (a
+    # concurrent checkout claimed it first). The claimed cart is then dropped once
+    # the order commits, or put back when the order fails.
+    def claim_cart(self, cart_id):
+        raise NotImplementedError
+
+    def release_cart(self, cart_id):
+        raise NotImplementedError
+
+    def delete_claimed_cart(self, cart_id):
+        raise NotImplementedError
+
+
+def merge_lines(lines):
+    # one line per product, an upsert may not touch the same row twice in one statement
+    merged = {}
+    for product_id, quantity in lines:
+        merged[product_id] = merged.get(product_id, 0) + quantity
+    return list(merged.items())
+
+
+def upsert_cart_items(cart_id, lines):
+    # INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE quantity = quantity + new quantity.
+    # bulk_create(update_conflicts=True) can only overwrite columns, not increment them.
+    quote = connection.ops.quote_name
+    opts = CartItem._meta
+    table = quote(opts.db_table)
+    pk = quote(opts.pk.column)
+    cart = quote(opts.get_field('cart').column)
+    product = quote(opts.get_field('product').column)
+    quantity = quote(opts.get_field('quantity').column)
+
+    values = ', '.join(['(%s, %s, %s)'] * len(lines))
+    params = [value for product_id, amount in lines for value in (cart_id, product_id, amount)]
+    insert = f'INSERT INTO {table} ({cart}, {product}, {quantity}) VALUES {values}'
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'{insert} ON DUPLICATE KEY UPDATE {quantity} = {quantity} + VALUES({quantity})', params)
+        elif connection.vendor in ('postgresql', 'sqlite'):
+            upsert = f'{insert} ON CONFLICT ({cart}, {product}) DO UPDATE SET {quantity} = {table}.{quantity} + EXCLUDED.{quantity}'
+            if connection.features.can_return_rows_from_bulk_insert:
+                cursor.execute(f'{upsert} RETURNING {pk}, {product}, {quantity}', params)
+                return [
+                    CartItem(id=item_id, cart_id=cart_id, product_id=product_id, quantity=amount)
+                    for item_id, product_id, amount in cursor.fetchall()
+                ]
+            cursor.execute(upsert, params)
+        else:
+            return None
+    return list(
+        CartItem.objects
+        .filter(cart_id=cart_id, product_id__in=[product_id for product_id, _ in lines])
+        .only('id', 'cart_id', 'product_id', 'quantity')
+    )
+
+
+def build_items(cart_id, lines):
+    # lines are (item_id, product_id, quantity); one query loads every product,
+    # lines whose product was deleted in the meantime are dropped
+    products = Product.objects.only('id', 'title', 'price').in_bulk([product_id for _, product_id, _ in lines])
+    return [
+        CartItem(id=item_id, cart_id=cart_id, product=products[product_id], quantity=quantity)
+        for item_id, product_id, quantity in sorted(lines)
+        if product_id in products
+    ]
+
+
+def build_cart(cart_id, created_at, lines):
+    cart = Cart(id=cart_id, created_at=created_at)
+    # hand the items over the way prefetch_related would, so cart.items.all() needs no query
+    items = CartItem.objects.filter(cart_id=cart_id)
+    items._result_cache = build_items(cart_id, lines)
+    items._prefetch_done = True
+    cart._prefetched_objects_cache = {'items': items}
+    return cart
+
+
+class DatabaseCartStore(BaseCartStore):
+    transactional = True
+
+    def create_cart(self):
+        return Cart.objects.create()
+
+    def get_cart(self, cart_id):
+        return Cart.objects.prefetch_related('items__product').filter(pk=cart_id).first()
+
+    def delete_cart(self, cart_id):
+        deleted, _ = Cart.objects.filter(pk=cart_id).delete()
+        return deleted > 0
+
+    def list_items(self, cart_id):
+        return CartItem.objects.select_related('product').filter(cart_id=cart_id)
+
+    def get_item(self, cart_id, item_id):
+        return self.list_items(cart_id).filter(pk=item_id).first()
+
+    def add_item(self, cart_id, product_id, quantity):
+        items = self.add_items(cart_id, [(product_id, quantity)])
+        return items[0] if items else None
+
+    def add_items(self, cart_id, lines):
+        lines = merge_lines(lines)
+        if not lines:
+            return []
+        try:
+            with transaction.atomic():
+                items = upsert_cart_items(cart_id, lines)
+                if items is None:
+                    items = [self._increment(cart_id, product_id, quantity) for product_id, quantity in lines]
+                return items
+        except IntegrityError:
+            # the cart does not exist
+            return None
+
+    def _increment(self, cart_id, product_id, quantity):
+        # fallback for backends without an upsert: UPDATE with F(), INSERT when no row matched
+        items = CartItem.objects.filter(cart_id=cart_id, product_id=product_id)
+        if not items.update(quantity=F('quantity') + quantity):
+            try:
+                with transaction.atomic():
+                    return CartItem.objects.create(cart_id=cart_id, product_id=product_id, quantity=quantity)
+            except IntegrityError:
+                # lost the race against a concurrent insert of the same line, or the cart is gone
+                if not items.update(quantity=F('quantity') + quantity):
+                    raise
+        return items.get()
+
+    def update_item(self, cart_id, item_id, quantity):
+        cart_item = self.get_item(cart_id, item_id)
+        if cart_item is not None:
+            cart_item.quantity = quantity
+            cart_item.save(update_fields=['quantity'])
+        return cart_item
+
+    def remove_item(self, cart_id, item_id):
+        deleted, _ = CartItem.objects.filter(cart_id=cart_id, pk=item_id).delete()
+        return deleted > 0
+
+    def get_lines(self, cart_id):
+        if not Cart.objects.filter(pk=cart_id).exists():
+            return None
+        return list(CartItem.objects.filter(cart_id=cart_id).values_list('product_id', 'quantity'))
+
+
+# Atomically bumps a line's quantity and allocates an item id for new lines.
+# KEYS: cart hash, item id sequence   ARGV: product id, quantity, ttl
+ADD_ITEM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local quantity = redis.call('HINCRBY', KEYS[1], 'q:' .. ARGV[1], ARGV[2])
+local item_id = redis.call('HGET', KEYS[1], 'i:' .. ARGV[1])
+if not item_id then
+    item_id = redis.call('INCR', KEYS[2])
+    redis.call('HSET', KEYS[1], 'i:' .. ARGV[1], item_id)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {tonumber(item_id), quantity}
+"""
+
+# Sets a line's quantity only while the cart and the line still exist, so a
+# line removed (or a cart expired) since it was read is never recreated half-way.
+# KEYS: cart hash   ARGV: product id, quantity, ttl
+UPDATE_ITEM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 or redis.call('HEXISTS', KEYS[1], 'i:' .. ARGV[1]) == 0 then
+    return false
+end
+redis.call('HSET', KEYS[1], 'q:' .. ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return tonumber(ARGV[2])
+"""
+
+# Moves a cart to its checkout key unless it is gone, and returns its fields.
+# KEYS: cart hash, claimed hash   ARGV: ttl
+CLAIM_CART_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+redis.call('RENAME', KEYS[1], KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return redis.call('HGETALL', KEYS[2])
+"""
+
+# Puts a claimed cart back, unless it expired or a cart with the same id exists again.
+# KEYS: claimed hash, cart hash   ARGV: ttl
+RELEASE_CART_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 and redis.call('EXISTS', KEYS[2]) == 0 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+end
+return true
+"""
+
+
+# One hash per cart with a sliding TTL:
+#   created_at -> iso timestamp, q:<product_id> -> quantity, i:<product_id> -> item id
+class RedisCartStore(BaseCartStore):
+    key_prefix = 'cart'
+
+    def __init__(self, url=None, ttl=None):
+        import redis
+
+        self.client = redis.Redis.from_url(url or settings.STORE_CART_REDIS_URL, decode_responses=True)
+        self.ttl = ttl or getattr(settings, 'STORE_CART_TTL', 7 * 24 * 60 * 60)
+        self.add_item_script = self.client.register_script(ADD_ITEM_SCRIPT)
+        self.update_item_script = self.client.register_script(UPDATE_ITEM_SCRIPT)
+        self.claim_cart_script = self.client.register_script(CLAIM_CART_SCRIPT)
+        self.release_cart_script = self.client.register_script(RELEASE_CART_SCRIPT)
+
+    def _key(self, cart_id):
+        return f'{self.key_prefix}:{cart_id}'
+
+    def _sequence_key(self):
+        return f'{self.key_prefix}:item_seq'
+
+    def _claimed_key(self, cart_id):
+        return f'{self._key(cart_id)}:checkout'
+
+    def _read(self, cart_id):
+        pipe = self.client.pipeline()
+        pipe.hgetall(self._key(cart_id))
+        pipe.expire(self._key(cart_id), self.ttl)
+        data, _ = pipe.execute()
+        return self._parse(data)
+
+    @staticmethod
+    def _parse(data):
+        if not data or 'created_at' not in data:
+            # a hash without created_at is not a cart this store wrote; treat it as gone
+            return None, []
+        lines = [
+            (int(data[f'i:{field[2:]}']), int(field[2:]), int(quantity))
+            for field, quantity in data.items()
+            if field.startswith('q:') and f'i:{field[2:]}' in data
+        ]
+        return parse_datetime(data['created_at']), lines
+
+    def create_cart(self):
+        cart_id, created_at = generate_uuid_hex(), timezone.now()
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(cart_id), 'created_at', created_at.isoformat())
+        pipe.expire(self._key(cart_id), self.ttl)
+        pipe.execute()
+        return build_cart(cart_id, created_at, [])
+
+    def get_cart(self, cart_id):
+        created_at, lines = self._read(cart_id)
+        if created_at is None:
+            return None
+        return build_cart(cart_id, created_at, lines)
+
+    def delete_cart(self, cart_id):
+        return self.client.delete(self._key(cart_id)) > 0
+
+    def list_items(self, cart_id):
+        _, lines = self._read(cart_id)
+        return build_items(cart_id, lines)
+
+    def get_item(self, cart_id, item_id):
+        _, lines = self._read(cart_id)
+        return next(iter(build_items(cart_id, [line for line in lines if line[0] == int(item_id)])), None)
+
+    def add_item(self, cart_id, product_id, quantity):
+        result = self.add_item_script(
+            keys=[self._key(cart_id), self._sequence_key()],
+            args=[product_id, quantity, self.ttl],
+        )
+        if result is None:
+            return None
+        item_id, quantity = result
+        return CartItem(id=item_id, cart_id=cart_id, product_id=product_id, quantity=quantity)
+
+    def add_items(self, cart_id, lines):
+        lines = merge_lines(lines)
+        pipe = self.client.pipeline(transaction=False)
+        for product_id, quantity in lines:
+            self.add_item_script(keys=[self._key(cart_id), self._sequence_key()], args=[product_id, quantity, self.ttl], client=pipe)
+        results = pipe.execute()
+        if any(result is None for result in results):
+            return None
+        return [
+            CartItem(id=item_id, cart_id=cart_id, product_id=product_id, quantity=quantity)
+            for (product_id, _), (item_id, quantity) in zip(lines, results)
+        ]
+
+    def update_item(self, cart_id, item_id, quantity):
+        cart_item = self.get_item(cart_id, item_id)
+        if cart_item is None:
+            return None
+        # the line may have been removed, or the cart expired, since get_item read it
+        if self.update_item_script(keys=[self._key(cart_id)], args=[cart_item.product_id, quantity, self.ttl]) is None:
+            return None
+        cart_item.quantity = quantity
+        return cart_item
+
+    def remove_item(self, cart_id, item_id):
+        _, lines = self._read(cart_id)
+        for line_item_id, product_id, _ in lines:
+            if line_item_id == int(item_id):
+                self.client.hdel(self._key(cart_id), f'q:{product_id}', f'i:{product_id}')
+                return True
+        return False
+
+    def get_lines(self, cart_id):
+        created_at, lines = self._read(cart_id)
+        if created_at is None:
+            return None
+        return [(product_id, quantity) for _, product_id, quantity in lines]
+
+    def claim_cart(self, cart_id):
+        fields = self.claim_cart_script(keys=[self._key(cart_id), self._claimed_key(cart_id)], args=[self.ttl])
+        if fields is None:
+            return None
+        created_at, lines = self._parse(dict(zip(fields[::2], fields[1::2])))
+        if created_at is None:
+            return None
+        return [(product_id, quantity) for _, product_id, quantity in lines]
+
+    def release_cart(self, cart_id):
+        self.release_cart_script(keys=[self._claimed_key(cart_id), self._key(cart_id)], args=[self.ttl])
+
+    def delete_claimed_cart(self, cart_id):
+        self.client.delete(self._claimed_key(cart_id))
+
+
+# In-process store with the same semantics as RedisCartStore, for tests and single-process setups
+class LocMemCartStore(BaseCartStore):
+    _carts = {}
+    _claimed = {}
+    _lock = threading.Lock()
+    _item_ids = itertools.count(1)
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or getattr(settings, 'STORE_CART_TTL', 7 * 24 * 60 * 60)
+
+    def _get(self, cart_id):
+        cart = self._carts.get(cart_id)
+        if cart is None:
+            return None
+        if cart['expires_at'] < time.monotonic():
+            del self._carts[cart_id]
+            return None
+        cart['expires_at'] = time.monotonic() + self.ttl
+        return cart
+
+    @staticmethod
+    def _lines(cart):
+        return [(item_id, product_id, quantity) for product_id, (item_id, quantity) in cart['items'].items()]
+
+    def create_cart(self):
+        cart_id, created_at = generate_uuid_hex(), timezone.now()
+        with self._lock:
+            self._carts[cart_id] = {'created_at': created_at, 'expires_at': time.monotonic() + self.ttl, 'items': {}}
+        return build_cart(cart_id, created_at, [])
+
+    def get_cart(self, cart_id):
+        with self._lock:
+            cart = self._get(cart_id)
+            if cart is None:
+                return None
+            created_at, lines = cart['created_at'], self._lines(cart)
+        return build_cart(cart_id, created_at, lines)
+
+    def delete_cart(self, cart_id):
+        with self._lock:
+            return self._carts.pop(cart_id, None) is not None
+
+    def list_items(self, cart_id):
+        with self._lock:
+            cart = self._get(cart_id)
+            lines = self._lines(cart) if cart is not None else []
+        return build_items(cart_id, lines)
+
+    def get_item(self, cart_id, item_id):
+        return next((item for item in self.list_items(cart_id) if item.id == int(item_id)), None)
+
+    def add_item(self, cart_id, product_id, quantity):
+        with self._lock:
+            cart = self._get(cart_id)
+            if cart is None:
+                return None
+            line = cart['items'].setdefault(product_id, [next(self._item_ids), 0])
+            line[1] += quantity
+            item_id, quantity = line
+        return CartItem(id=item_id, cart_id=cart_id, product_id=product_id, quantity=quantity)
+
+    def update_item(self, cart_id, item_id, quantity):
+        cart_item = self.get_item(cart_id, item_id)
+        if cart_item is not None:
+            with self._lock:
+                cart = self._get(cart_id)
+                if cart is None or cart_item.product_id not in cart['items']:
+                    return None
+                cart['items'][cart_item.product_id][1] = quantity
+            cart_item.quantity = quantity
+        return cart_item
+
+    def remove_item(self, cart_id, item_id):
+        with self._lock:
+            cart = self._get(cart_id)
+            if cart is None:
+                return False
+            for product_id, (line_item_id, _) in list(cart['items'].items()):
+                if line_item_id == int(item_id):
+                    del cart['items'][product_id]
+                    return True
+        return False
+
+    def get_lines(self, cart_id):
+        with self._lock:
+            cart = self._get(cart_id)
+            if cart is None:
+                return None
+            return [(product_id, quantity) for product_id, (_, quantity) in cart['items'].items()]
+
+    def claim_cart(self, cart_id):
+        with self._lock:
+            cart = self._get(cart_id)
+            if cart is None:
+                return None
+            self._claimed[cart_id] = self._carts.pop(cart_id)
+            return [(product_id, quantity) for product_id, (_, quantity) in cart['items'].items()]
+
+    def release_cart(self, cart_id):
+        with self._lock:
+            cart = self._claimed.pop(cart_id, None)
+            if cart is not None:
+                self._carts.setdefault(cart_id, cart)
+
+    def delete_claimed_cart(self, cart_id):
+        with self._lock:
+            self._claimed.pop(cart_id, None)
+
+
+_store = None
+
+
+def get_cart_store():
+    global _store
+    if _store is None:
+        _store = import_string(getattr(settings, 'STORE_CART_BACKEND', 'store.carts.DatabaseCartStore'))()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_cart_store(setting, **kwargs):
+    global _store
+    if setting.startswith('STORE_CART_'):
+        _store = None
@@ -0,0 +1,237 @@
+import csv
+import decimal
+import gzip
+import json
+import sys
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from store import search
+from store.models import Collection, Product, Promotion
+
+
+FIELDS = ['id', 'title', 'description', 'price', 'inventory', 'collection', 'promotions']
+UPDATE_FIELDS = ['title', 'description', 'price', 'inventory', 'collection', 'last_update']
+PROMOTION_SEPARATOR = '|'
+MAX_PRICE = decimal.Decimal('9999.99')  # Product.price is max_digits=6, decimal_places=2
+
+
+class RowError(ValueError):
+    pass
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def open_text(path, mode):
+    if path == '-':
+        return sys.stdin if 'r' in mode else sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+# yields (line number, raw row) without ever holding more than one line of the feed
+def read_rows(file, fmt):
+    if fmt == 'csv':
+        for line, row in enumerate(csv.DictReader(file), start=2):
+            yield line, row
+        return
+    for line, text in enumerate(file, start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError as error:
+            yield line, RowError(f'invalid JSON: {error}')
+
+
+# Turns raw feed rows into plain dicts ready for write_batch. Collections and
+# promotions are resolved against maps loaded once up front, so parsing a row
+# never queries the database (except to create a missing collection once).
+class RowParser:
+    def __init__(self, create_collections=False):
+        self.create_collections = create_collections
+        self.collection_ids = set()
+        self.collections_by_title = {}
+        for pk, title in Collection.objects.values_list('id', 'title').order_by('id'):
+            self.collection_ids.add(pk)
+            self.collections_by_title.setdefault(title.strip().lower(), pk)
+        self.promotion_ids = set(Promotion.objects.values_list('id', flat=True))
+
+    def collection(self, value):
+        value = str(value if value is not None else '').strip()
+        if not value:
+            raise RowError('collection is required')
+        if value.isdigit():
+            if int(value) not in self.collection_ids:
+                raise RowError(f'unknown collection id {value}')
+            return int(value)
+        pk = self.collections_by_title.get(value.lower())
+        if pk is None:
+            if not self.create_collections:
+                raise RowError(f'unknown collection "{value}"')
+            pk = Collection.objects.create(title=value).pk
+            self.collection_ids.add(pk)
+            self.collections_by_title[value.lower()] = pk
+        return pk
+
+    def promotions(self, value):
+        # a missing column leaves the product's promotions alone, an empty one clears them
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = [part for part in value.split(PROMOTION_SEPARATOR) if part.strip()]
+        try:
+            ids = sorted({int(part) for part in value})
+        except (TypeError, ValueError):
+            raise RowError(f'promotions must be ids separated by "{PROMOTION_SEPARATOR}"')
+        unknown = [pk for pk in ids if pk not in self.promotion_ids]
+        if unknown:
+            raise RowError(f'unknown promotions {unknown}')
+        return ids
+
+    def parse(self, raw):
+        if isinstance(raw, RowError):
+            raise raw
+        if not isinstance(raw, dict):
+            raise RowError('expected an object per line')
+        title = str(raw.get('title') or '').strip()
+        if not title:
+            raise RowError('title is required')
+        try:
+            price = decimal.Decimal(str(raw.get('price'))).quantize(decimal.Decimal('0.01'))
+            inventory = int(raw.get('inventory'))
+        except (TypeError, ValueError, decimal.InvalidOperation):
+            raise RowError('price must be a decimal and inventory an integer')
+        if not 0 <= price <= MAX_PRICE:
+            raise RowError(f'price must be between 0 and {MAX_PRICE}')
+        if inventory < 0:
+            raise RowError('inventory must not be negative')
+        pk = raw.get('id')
+        return {
+            'id': int(pk) if pk not in (None, '') else None,
+            'title': title[:255],
+            'description': str(raw.get('description') or ''),
+            'price': price,
+            'inventory': inventory,
+            'collection_id': self.collection(raw.get('collection')),
+            'promotions': self.promotions(raw.get('promotions')),
+        }
+
+
+def _upsert(products):
+    if connection.features.supports_update_conflicts:
+        options = {'update_conflicts': True, 'update_fields': UPDATE_FIELDS}
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['id']
+        Product.objects.bulk_create(products, **options)
+        return
+    ids = [product.pk for product in products if product.pk is not None]
+    existing = set(Product.objects.filter(pk__in=ids).values_list('id', flat=True))
+    now = timezone.now()
+    updates = [product for product in products if product.pk in existing]
+    for product in updates:
+        product.last_update = now  # bulk_update does not apply auto_now
+    Product.objects.bulk_update(updates, UPDATE_FIELDS)
+    Product.objects.bulk_create([product for product in products if product.pk not in existing])
+
+
+def dedupe_rows(rows):
+    # a feed may repeat an id within one batch; the last row wins, as it would row by row
+    # (PostgreSQL's ON CONFLICT DO UPDATE cannot touch the same row twice in one statement)
+    seen, kept = set(), []
+    for row in reversed(rows):
+        if row['id'] is not None:
+            if row['id'] in seen:
+                continue
+            seen.add(row['id'])
+        kept.append(row)
+    kept.reverse()
+    return kept
+
+
+# Writes one parsed batch in its own transaction. Only bulk statements are used,
+# so no per-row post_save/m2m_changed signals fire; the caller invalidates the
+# catalog cache and reconciles collection counts once at the end.
+# Returns (rows whose new ids the backend did not report back (MySQL): those
+# rows are not indexed and their promotions are not linked, the collections the
+# batch's existing products were in before, which must be invalidated too).
+def write_batch(rows):
+    rows = dedupe_rows(rows)
+    products = [
+        Product(
+            pk=row['id'], title=row['title'], description=row['description'], price=row['price'],
+            inventory=row['inventory'], collection_id=row['collection_id'],
+        )
+        for row in rows
+    ]
+    through = Product.promotions.through
+    with transaction.atomic():
+        # products moved to another collection leave the old collection's pages stale
+        previous_collection_ids = set(
+            Product.objects.filter(pk__in=[row['id'] for row in rows if row['id'] is not None])
+            .values_list('collection_id', flat=True).distinct()
+        )
+        _upsert(products)
+        written = [(product, row) for product, row in zip(products, rows) if product.pk is not None]
+        linked = [(product.pk, row['promotions']) for product, row in written if row['promotions'] is not None]
+        if linked:
+            through.objects.filter(product_id__in=[pk for pk, _ in linked]).delete()
+            through.objects.bulk_create(
+                [through(product_id=pk, promotion_id=promotion_id) for pk, promotions in linked for promotion_id in promotions],
+                ignore_conflicts=True,
+            )
+        search.index_products([product for product, _ in written])
+    return len(products) - len(written), previous_collection_ids
+
+
+def reset_product_sequence():
+    # rows imported with explicit ids do not advance PostgreSQL/Oracle sequences
+    statements = connection.ops.sequence_reset_sql(no_style(), [Product])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def export_products(file, fmt, chunk_size=2000):
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(file, FIELDS)
+        writer.writeheader()
+    through = Product.promotions.through
+    last_id, exported = 0, 0
+    while True:
+        # primary key chunks keep memory flat on every backend
+        chunk = list(
+            Product.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'title', 'description', 'price', 'inventory', 'collection_id')[:chunk_size]
+        )
+        if not chunk:
+            return exported
+        promotions = {}
+        for product_id, promotion_id in through.objects.filter(
+            product_id__in=[row[0] for row in chunk]
+        ).values_list('product_id', 'promotion_id').order_by('product_id', 'promotion_id'):
+            promotions.setdefault(product_id, []).append(promotion_id)
+        for pk, title, description, price, inventory, collection_id in chunk:
+            ids = promotions.get(pk, [])
+            if writer is not None:
+                writer.writerow({
+                    'id': pk, 'title': title, 'description': description, 'price': price, 'inventory': inventory,
+                    'collection': collection_id, 'promotions': PROMOTION_SEPARATOR.join(map(str, ids)),
+                })
+            else:
+                file.write(json.dumps({
+                    'id': pk, 'title': title, 'description': description, 'price': str(price),
+                    'inventory': inventory, 'collection': collection_id, 'promotions': ids,
+                }) + '\n')
+        exported += len(chunk)
+        last_id = chunk[-1][0]
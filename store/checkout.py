@@ -0,0 +1,113 @@
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.db.models.functions import Now
+from store.carts import merge_lines
+from store.models import Customer, Order, OrderItem, Product
+from store import cache as catalog_cache
+from store import outbox
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f'Not enough inventory for products: {self.product_ids}')
+
+
+class InvalidQuantity(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f'Quantities must be at least 1 for products: {self.product_ids}')
+
+
+class CartUnavailable(Exception):
+    def __init__(self, cart_id):
+        self.cart_id = cart_id
+        super().__init__(f'Cart {cart_id} was checked out or deleted')
+
+
+def reserve_inventory(lines, batch_size=None):
+    # One conditional UPDATE per batch:
+    #   UPDATE product SET inventory = CASE id WHEN .. THEN inventory - qty .. END
+    #   WHERE (id = 1 AND inventory >= 2) OR (id = 7 AND inventory >= 1) ...
+    # A row that cannot cover its quantity is not matched, so a short row count means oversell.
+    # update() sends no signals: place_order invalidates the cached catalog pages once the
+    # order commits; the conditional UPDATE is what actually guards stock.
+    # last_update is bumped so product detail validators (ETag/Last-Modified) move.
+    batch_size = batch_size or getattr(settings, 'STORE_CHECKOUT_BATCH_SIZE', 100)
+    for start in range(0, len(lines), batch_size):
+        batch = lines[start:start + batch_size]
+        updated = Product.objects.filter(
+            reduce(or_, (Q(pk=product_id, inventory__gte=quantity) for product_id, quantity in batch))
+        ).update(
+            inventory=Case(
+                *[When(pk=product_id, then=F('inventory') - quantity) for product_id, quantity in batch],
+                default=F('inventory'),
+            ),
+            last_update=Now(),
+        )
+        if updated != len(batch):
+            raise OutOfStock(find_short_products(batch))
+
+
+def find_short_products(lines):
+    available = dict(Product.objects.filter(pk__in=[product_id for product_id, _ in lines]).values_list('id', 'inventory'))
+    return [product_id for product_id, quantity in lines if available.get(product_id, 0) < quantity]
+
+
+def place_order(user_id, cart_id, lines, cart_store):
+    if not cart_store.transactional:
+        # claimed before anything is reserved, so a concurrent checkout of the same cart finds nothing;
+        # the claimed lines are the ones ordered
+        lines = cart_store.claim_cart(cart_id)
+        if lines is None:
+            raise CartUnavailable(cart_id)
+    try:
+        return _place_order(user_id, cart_id, lines, cart_store)
+    except BaseException:
+        if not cart_store.transactional:
+            cart_store.release_cart(cart_id)
+        raise
+
+
+def _place_order(user_id, cart_id, lines, cart_store):
+    # sorted so concurrent checkouts lock product rows in the same order and cannot deadlock
+    lines = sorted(merge_lines(lines))
+    # a negative line would put stock back in reserve_inventory
+    invalid = [product_id for product_id, quantity in lines if quantity < 1]
+    if invalid:
+        raise InvalidQuantity(invalid)
+    customer_id = Customer.objects.values_list('id', flat=True).get(user_id=user_id)
+    # prices are captured before the transaction so nothing runs between the reads and the locks
+    products = list(Product.objects.filter(pk__in=[product_id for product_id, _ in lines]).values_list('id', 'price', 'collection_id'))
+    prices = {product_id: price for product_id, price, _ in products}
+    collection_ids = {collection_id for _, _, collection_id in products}
+
+    try:
+        with transaction.atomic():
+            if cart_store.transactional and not cart_store.delete_cart(cart_id):
+                # the delete is the guard: a concurrent checkout of the cart waits on its row
+                # lock and then finds nothing to delete, before reserving anything
+                raise CartUnavailable(cart_id)
+            order = Order.objects.create(customer_id=customer_id)
+            # the inventory UPDATE takes the product row locks; everything after it is short
+            # (on MySQL the order item FK checks would otherwise take shared locks first and deadlock)
+            reserve_inventory(lines)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=product_id, unit_price=prices[product_id], quantity=quantity)
+                for product_id, quantity in lines
+            ])
+            if not cart_store.transactional:
+                # an external store must only drop the cart once the order is durable
+                transaction.on_commit(lambda: cart_store.delete_claimed_cart(cart_id))
+            # receivers run in the outbox drainer, off the request path
+            outbox.publish(outbox.ORDER_CREATED, order_id=order.pk)
+            # cached product pages show inventory
+            transaction.on_commit(lambda: catalog_cache.invalidate(collection_ids))
+    except OutOfStock as error:
+        # the transaction rolled back; the first batch may have been fine, re-check them all
+        raise OutOfStock(find_short_products(lines) or error.product_ids)
+    return order
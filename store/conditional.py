@@ -0,0 +1,73 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from store.cache import normalize_params
+
+
+def time_bucket():
+    # for data that changes without a version bump (inventory at checkout):
+    # validators roll over with the catalog cache entries, so neither can pin
+    # a stale body longer than STORE_CATALOG_CACHE_TIMEOUT
+    return int(time.time() // getattr(settings, 'STORE_CATALOG_CACHE_TIMEOUT', 300))
+
+
+# ETag / Last-Modified support for list and retrieve. Views provide a cheap
+# validator (a version counter, a row timestamp) that changes whenever the body
+# can; it is checked before anything is serialized and answered with a 304 when
+# the client's copy is current. Must come before CatalogCacheMixin in the bases:
+# the validator is also folded into the catalog cache key, so a cached body can
+# never be older than the validator sent with it.
+class ConditionalGetMixin:
+    def get_list_validator(self, request):
+        return None
+
+    # (validator, last_modified datetime or None), or None when the row does not exist
+    def get_detail_validator(self, request):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, 'list', self.get_list_validator(request), None,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        validator, last_modified = self.get_detail_validator(request) or (None, None)
+        return self.conditional_response(
+            request, 'retrieve', validator, last_modified,
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+        )
+
+    def make_etag(self, request, action, validator):
+        # the same validator renders differently per host (absolute urls), query and format (JSON / browsable API)
+        fingerprint = '|'.join([
+            self.basename, action, str(self.kwargs.get('pk', '')), str(validator),
+            request.build_absolute_uri('/'), normalize_params(request.query_params),
+            getattr(request.accepted_renderer, 'format', ''),
+        ])
+        return 'W/"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    def conditional_response(self, request, action, validator, last_modified, build_response):
+        if validator is None or request.method not in ('GET', 'HEAD'):
+            return build_response()
+        request.catalog_validator = validator
+        etag = self.make_etag(request, action, validator)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = build_response()
+            if response.status_code != 200:
+                return response
+        self.set_validators(response, etag, timestamp)
+        return response
+
+    def set_validators(self, response, etag, timestamp):
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        # shared caches may store but must revalidate (cheaply, thanks to the validators)
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'STORE_CATALOG_HTTP_MAX_AGE', 0), must_revalidate=True)
+        patch_vary_headers(response, ['Accept'])
@@ -0,0 +1,19 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from store.models import Collection, Product
+
+
+def reconcile_collection_counts(collections=None):
+    # one UPDATE ... SET products_count = (SELECT COUNT(*) ...) over the given collections
+    live_count = (
+        Product.objects
+        .filter(collection=OuterRef('pk'))
+        .order_by()
+        .values('collection')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    collections = Collection.objects.all() if collections is None else collections
+    return collections.update(
+        products_count=Coalesce(Subquery(live_count, output_field=IntegerField()), Value(0))
+    )
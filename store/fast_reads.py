@@ -0,0 +1,133 @@
+import decimal
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404
+from rest_framework.response import Response
+from store.models import Product, ProductImage
+from store.serializers import EXPAND_PARAM, ProductSerializer, product_tags
+
+
+# the product columns the compiled reader renders from; id/title/price also feed ordering and keyset cursors
+ROW_COLUMNS = ['id', 'title', 'description', 'price', 'inventory', 'collection_id']
+IMAGE_COLUMNS = ['id', 'product_id', 'image', 'variants']
+
+# ProductSerializer.calculate_price_with_tax builds this from the float 1.2 on
+# every row; the same value, built once, keeps the output identical
+TAX_RATE = decimal.Decimal(1.2)
+
+_price_field = Product._meta.get_field('price')
+PRICE_QUANTUM = decimal.Decimal('.1') ** _price_field.decimal_places
+# what DRF's DecimalField.quantize uses: the current context with max_digits precision
+PRICE_CONTEXT = decimal.getcontext().copy()
+PRICE_CONTEXT.prec = _price_field.max_digits
+
+
+def is_enabled():
+    return getattr(settings, 'STORE_FAST_PRODUCT_READS', False)
+
+
+def quantize_price(value):
+    return value.quantize(PRICE_QUANTUM, context=PRICE_CONTEXT)
+
+
+# Renders ProductSerializer's representation straight from .values() rows and
+# image rows grouped per product, without instantiating any serializer fields.
+# Field getters are resolved once per request for the selected field names
+# (?fields= / ?omit=), so the per-row work is one dict comprehension.
+# The JSON it renders to is byte-identical to ProductSerializer's.
+class ProductReader:
+    def __init__(self, request, names, include_tags=False):
+        self.request = request
+        self.image_storage = ProductImage._meta.get_field('image').storage
+        self.images, self.tags = {}, {}
+        getters = {
+            'id': itemgetter('id'),
+            'title': itemgetter('title'),
+            'description': itemgetter('description'),
+            'price': lambda row: quantize_price(row['price']),
+            'inventory': itemgetter('inventory'),
+            'collection': itemgetter('collection_id'),
+            'price_with_tax': lambda row: row['price'] * TAX_RATE,
+            'images': lambda row: self.images.get(row['id'], []),
+        }
+        self.getters = [(name, getters[name]) for name in names]
+        if include_tags:
+            # appended last, like ProductSerializer.to_representation does
+            self.getters.append(('tags', lambda row: self.tags.get(row['id'], [])))
+        self.with_images = 'images' in names
+        self.include_tags = include_tags
+
+    def absolute(self, url):
+        # same absolute/relative rule as DRF's ImageField and ProductImageSerializer.file_url
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    def image_row(self, row):
+        variants = [
+            {'width': variant['width'], 'height': variant['height'], 'url': self.absolute(default_storage.url(variant['name']))}
+            for variant in row['variants']
+        ]
+        return {
+            'id': row['id'],
+            'image': self.absolute(self.image_storage.url(row['image'])) if row['image'] else None,
+            'variants': variants,
+            'srcset': ', '.join(f'{variant["url"]} {variant["width"]}w' for variant in variants),
+        }
+
+    def load_images(self, product_ids):
+        self.images = {}
+        if not product_ids:
+            return
+        rows = ProductImage.objects.filter(product_id__in=product_ids).order_by('id').values(*IMAGE_COLUMNS)
+        for row in rows:
+            self.images.setdefault(row['product_id'], []).append(self.image_row(row))
+
+    def render(self, rows):
+        if self.with_images:
+            self.load_images([row['id'] for row in rows])
+        if self.include_tags:
+            self.tags = product_tags([row['id'] for row in rows])
+        getters = self.getters
+        return [{name: getter(row) for name, getter in getters} for row in rows]
+
+
+# ProductViewSet's list and retrieve through ProductReader when
+# STORE_FAST_PRODUCT_READS is on. Sits below CatalogCacheMixin, so only cache
+# misses get here. ?expand= needs nested serializers and takes the regular path.
+class FastProductReadMixin:
+    def use_fast_reads(self, request):
+        return is_enabled() and not request.query_params.get(EXPAND_PARAM)
+
+    def get_fast_reader(self, request):
+        names, _ = ProductSerializer.select_fields(request.query_params)
+        include_tags = 'tags' in ProductSerializer.select_includes(request.query_params)
+        return ProductReader(request, names, include_tags)
+
+    def get_row_queryset(self):
+        # prefetch_related does not apply to .values() rows; images are loaded by the reader
+        return self.get_queryset().prefetch_related(None).values(*ROW_COLUMNS)
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_reads(request):
+            return super().list(request, *args, **kwargs)
+        reader = self.get_fast_reader(request)
+        queryset = self.filter_queryset(self.get_row_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.render(page))
+        return Response(reader.render(list(queryset)))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_fast_reads(request):
+            return super().retrieve(request, *args, **kwargs)
+        reader = self.get_fast_reader(request)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            # filtered like GenericAPIView.get_object
+            row = self.filter_queryset(self.get_row_queryset()).filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).first()
+        except (TypeError, ValueError):
+            raise Http404
+        if row is None:
+            raise Http404
+        return Response(reader.render([row])[0])
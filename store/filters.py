@@ -1,10 +1,20 @@
-from django_filters.rest_framework import FilterSet
-from store.models import Product    
+from django.contrib.contenttypes.models import ContentType
+from django_filters.rest_framework import CharFilter, FilterSet
+from store.models import Product
+from tags.models import TaggedItem
+
 
 class ProductFilter(FilterSet):
+    # ?tag=<label> ---> products carrying that tag, through the (tag, content_type) index
+    tag = CharFilter(method='filter_tag', label='Tag label')
+
     class Meta:
         model = Product
         fields = {
             'collection_id': ['exact'],
             'price': ['gt', 'lt'],
-        }
\ No newline at end of file
+        }
+
+    def filter_tag(self, queryset, name, value):
+        tagged = TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Product), tag__label=value)
+        return queryset.filter(pk__in=tagged.values('object_id'))
@@ -0,0 +1,114 @@
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# backends that keep entries per process: a retry served by another worker is not recognized
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def get_cache():
+    return caches[getattr(settings, 'STORE_IDEMPOTENCY_CACHE_ALIAS', 'default')]
+
+
+def request_fingerprint(request):
+    return hashlib.sha256(json.dumps(request.data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def request_owner(request):
+    if request.user and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    # anonymous callers share no identity; the client address (and session, if any) keeps
+    # one client's key from replaying another's response. A retry from a new address
+    # simply runs again.
+    session = getattr(request, 'session', None)
+    session_key = session.session_key if session is not None else None
+    return f'anonymous:{request.META.get("REMOTE_ADDR", "")}:{session_key or ""}'
+
+
+def cache_key(request, key):
+    # scoped to the caller and the endpoint
+    scope = f'{request_owner(request)}|{request.method}|{request.path}|{key}'
+    return 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def check_cache_backend(app_configs=None, **kwargs):
+    # registered in StoreConfig.ready; a per-process cache only deduplicates retries that hit the same worker
+    alias = getattr(settings, 'STORE_IDEMPOTENCY_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if settings.DEBUG or backend not in PER_PROCESS_BACKENDS:
+        return []
+    return [checks.Warning(
+        f'STORE_IDEMPOTENCY_CACHE_ALIAS "{alias}" uses {backend}, which is per process.',
+        hint='Idempotency-Key retries reaching another worker run again; point the alias at a shared cache (set CACHE_REDIS_URL).',
+        id='store.W001',
+    )]
+
+
+# Decorator for viewset actions. A request carrying an Idempotency-Key header
+# runs once; retries with the same key get the stored response back (errors
+# included) without running the view again, while a retry that arrives during
+# the first run gets 409.
+def idempotent(view_method):
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cache = get_cache()
+        stored_key = cache_key(request, key)
+        fingerprint = request_fingerprint(request)
+
+        stored = cache.get(stored_key)
+        if stored is not None:
+            if stored['fingerprint'] != fingerprint:
+                return Response(
+                    {'error': f'{HEADER} was already used with a different request body.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            response = Response(stored['data'], status=stored['status'])
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        lock_key = stored_key + ':lock'
+        if not cache.add(lock_key, 1, timeout=getattr(settings, 'STORE_IDEMPOTENCY_LOCK_TIMEOUT', 30)):
+            return Response(
+                {'error': f'A request with this {HEADER} is still being processed.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            except Exception as exc:
+                # rendered here the way DRF would (validation errors, 404s, ...), so a rejected
+                # request is stored and replayed like any other response; exceptions DRF does
+                # not handle are re-raised and leave nothing stored
+                response = self.handle_exception(exc)
+            # server errors and conflicts are worth retrying, everything else is final
+            if response.status_code < 500 and response.status_code not in (409, 429):
+                cache.set(stored_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, timeout=getattr(settings, 'STORE_IDEMPOTENCY_TTL', 24 * 60 * 60))
+        finally:
+            cache.delete(lock_key)
+        return response
+    return wrapper
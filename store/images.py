@@ -0,0 +1,139 @@
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+from store import cache as catalog_cache
+from store.models import ImageBlob, Product, ProductImage
+from store.storage import image_storage
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'store/images/variants'
+
+
+def variant_widths():
+    return sorted(getattr(settings, 'STORE_IMAGE_VARIANT_WIDTHS', [160, 320, 640, 1280]))
+
+
+def variant_name(source_name, width):
+    stem = posixpath.splitext(posixpath.basename(source_name))[0]
+    return f'{VARIANT_DIR}/{stem}-{width}w.webp'
+
+
+def render_variants(file, widths):
+    # yields (width, height, webp bytes), largest first so each step resizes
+    # the previous, already smaller, image instead of the full original
+    with Image.open(file) as original:
+        # JPEG can decode straight at a reduced scale, far cheaper than a full decode
+        original.draft('RGB', (widths[-1], widths[-1]))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        quality = getattr(settings, 'STORE_IMAGE_WEBP_QUALITY', 80)
+        for width in reversed(widths):
+            if width >= image.width:
+                continue  # never upscale; the original covers this size
+            height = max(round(image.height * width / image.width), 1)
+            image = image.resize((width, height), Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, 'WEBP', quality=quality, method=4)
+            yield width, height, buffer.getvalue()
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning('Could not delete image file %s', name, exc_info=True)
+
+
+# Blob reference counting. Rows with identical uploads share one file, so a
+# file (and its variants) is only deleted once no ProductImage points at it.
+def retain(name):
+    if ImageBlob.objects.filter(name=name).update(refcount=F('refcount') + 1):
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, refcount=1)
+    except IntegrityError:
+        ImageBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name, variants=()):
+    ImageBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+    transaction.on_commit(lambda: delete_if_unreferenced(name, variants))
+
+
+def delete_if_unreferenced(name, variants=()):
+    # the conditional delete is the check: an upload of the same content in the
+    # meantime has bumped the refcount again and keeps the file. The files go
+    # before the row's delete commits, so a concurrent retain() waits on the row
+    # until they are gone and restore_if_missing() then writes the blob again.
+    with transaction.atomic():
+        deleted, _ = ImageBlob.objects.filter(name=name, refcount=0).delete()
+        if not deleted:
+            return False
+        delete_files(image_storage(), [name])
+        variant_names = {variant['name'] for variant in variants} | {variant_name(name, width) for width in variant_widths()}
+        delete_files(default_storage, sorted(variant_names))
+    return True
+
+
+def restore_if_missing(field_file):
+    # ContentAddressedStorage._save skips content that is already on disk, and the
+    # last other reference could be released and the file deleted before retain()
+    # took this one. Once retained it cannot go any more, so one check suffices.
+    content = getattr(field_file, '_file', None)
+    if content is None or field_file.storage.exists(field_file.name):
+        return False
+    logger.warning('Image blob %s was deleted while being reused, writing it again', field_file.name)
+    field_file.storage.restore(field_file.name, content)
+    return True
+
+
+def save_variant(width, source_name, data):
+    # variants are named after the content-addressed source, so an existing file is already right
+    name = variant_name(source_name, width)
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(data))
+
+
+# Called from the generate_image_variants task. source_name is the file the
+# task was queued for: if the image has been replaced since, a newer task is
+# on its way and this one does nothing.
+def build_variants(image_id, source_name):
+    image = ProductImage.objects.filter(pk=image_id, image=source_name).only('id', 'image', 'product_id').first()
+    if image is None:
+        return []
+    # another row sharing the blob may already have them
+    variants = next(
+        (existing for existing in ProductImage.objects.filter(image=source_name).exclude(pk=image_id).values_list('variants', flat=True) if existing),
+        None,
+    )
+    if variants is None:
+        with image_storage().open(source_name) as file:
+            variants = [
+                {'width': width, 'height': height, 'name': save_variant(width, source_name, data)}
+                for width, height, data in render_variants(file, variant_widths())
+            ]
+        variants.sort(key=lambda variant: variant['width'])
+    if not ProductImage.objects.filter(pk=image_id, image=source_name).update(variants=variants):
+        # replaced or deleted while resizing; if that released the last reference the
+        # blob cleanup has already run and would never see these files
+        if not ImageBlob.objects.filter(name=source_name).exists():
+            delete_files(default_storage, [variant['name'] for variant in variants])
+        return []
+    # update() sends no signals; cached product pages still list the image without variants
+    collection_id = Product.objects.filter(pk=image.product_id).values_list('collection_id', flat=True).first()
+    catalog_cache.invalidate([collection_id])
+    Product.objects.filter(pk=image.product_id).update(last_update=timezone.now())
+    return variants
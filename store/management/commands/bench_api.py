@@ -0,0 +1,63 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from store import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every store endpoint through the Django test client and report p50/p95/p99 latency, '
+        'single-client throughput and query counts per endpoint as JSON. Load data with generate_fixtures first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='untimed requests per endpoint')
+        parser.add_argument('--only', nargs='*', default=None, help='endpoint names to run ({})'.format(
+            ', '.join(scenario.name for scenario in benchmarks.SCENARIOS)
+        ))
+        parser.add_argument(
+            '--write', action='store_true',
+            help='also run the endpoints that write (carts, checkout); what they create is left in the database',
+        )
+        parser.add_argument(
+            '--cached', action='store_true',
+            help='keep the catalog cache on; the repeated requests then mostly measure cache hits',
+        )
+        parser.add_argument('--output', default=None, help='write the JSON report here instead of stdout')
+        parser.add_argument('--compare', default=None, help='a previous report to diff p95 latencies against')
+
+    def handle(self, *args, **options):
+        runner = benchmarks.Runner(
+            requests=options['requests'], warmup=options['warmup'],
+            include_writes=options['write'], only=options['only'], use_cache=options['cached'],
+        )
+
+        def progress(name, result):
+            self.stderr.write(
+                f'{name:<20} p50 {result["p50_ms"]}ms  p95 {result["p95_ms"]}ms  queries {result["queries_avg"]}  '
+                f'cache hits {result["cache_hits"]}'
+            )
+
+        # the test client talks to "testserver", which production ALLOWED_HOSTS never lists
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                report = runner.run(progress=progress)
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+            for name, before, after, change in benchmarks.compare(baseline, report):
+                line = f'{name:<20} p95 {before}ms -> {after}ms ({change:+.1%})'
+                self.stderr.write(self.style.WARNING(line) if change > 0.1 else line)
@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from store.carts import get_cart_store
+from store.checkout import OutOfStock, place_order
+from store.models import Collection, Customer, Order, OrderItem, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark checkout throughput under contention: many concurrent orders on a few hot SKUs. '
+        'Use a server database (MySQL/PostgreSQL); SQLite serializes writers and reports lock errors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--skus', type=int, default=3, help='number of hot products every cart draws from')
+        parser.add_argument('--lines', type=int, default=2, help='lines per cart')
+        parser.add_argument('--inventory', type=int, default=None, help='starting inventory per SKU (default: enough for ~90%% of orders)')
+        parser.add_argument('--keep', action='store_true', help='keep the generated rows')
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        orders, threads = options['orders'], options['threads']
+        lines_per_cart = min(options['lines'], options['skus'])
+        inventory = options['inventory']
+        if inventory is None:
+            # slightly short so the oversell path is exercised as well
+            inventory = int(orders * lines_per_cart / options['skus'] * 0.9)
+
+        user = get_user_model().objects.create(username=f'bench-checkout-{run_id}', email=f'bench-checkout-{run_id}@example.com')
+        if not Customer.objects.filter(user=user).exists():
+            Customer.objects.create(user=user)
+        collection = Collection.objects.create(title=f'bench-checkout-{run_id}')
+        products = Product.objects.bulk_create([
+            Product(title=f'bench-{run_id}-{n}', description='', price='9.99', inventory=inventory, collection=collection)
+            for n in range(options['skus'])
+        ])
+        product_ids = [product.pk for product in products]
+
+        store = get_cart_store()
+        carts = []
+        for n in range(orders):
+            cart = store.create_cart()
+            lines = [(product_ids[(n + offset) % len(product_ids)], 1) for offset in range(lines_per_cart)]
+            store.add_items(cart.pk, lines)
+            carts.append((cart.pk, lines))
+
+        results = {'placed': 0, 'out_of_stock': 0, 'errors': 0}
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(chunk):
+            try:
+                for cart_id, lines in chunk:
+                    started = time.perf_counter()
+                    try:
+                        place_order(user.pk, cart_id, lines, store)
+                        outcome = 'placed'
+                    except OutOfStock:
+                        outcome = 'out_of_stock'
+                    except Exception:
+                        outcome = 'errors'
+                    with lock:
+                        results[outcome] += 1
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(carts[n::threads],)) for n in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        remaining = dict(Product.objects.filter(pk__in=product_ids).values_list('id', 'inventory'))
+        sold = dict.fromkeys(product_ids, 0)
+        for product_id, quantity in OrderItem.objects.filter(product_id__in=product_ids).values_list('product_id', 'quantity'):
+            sold[product_id] += quantity
+        consistent = all(remaining[pk] >= 0 and remaining[pk] + sold[pk] == inventory for pk in product_ids)
+
+        latencies.sort()
+        report = {
+            'orders': orders,
+            'threads': threads,
+            'skus': len(product_ids),
+            'lines_per_cart': lines_per_cart,
+            'vendor': connection.vendor,
+            'elapsed_s': round(elapsed, 3),
+            'orders_per_s': round(results['placed'] / elapsed, 1) if elapsed else None,
+            'attempts_per_s': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2) if latencies else None,
+            'inventory_consistent': consistent,
+            **results,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if not options['keep']:
+            order_ids = OrderItem.objects.filter(product_id__in=product_ids).values_list('order_id', flat=True)
+            OrderItem.objects.filter(order_id__in=list(order_ids)).delete()
+            Order.objects.filter(customer__user=user).delete()
+            for cart_id, _ in carts:
+                store.delete_cart(cart_id)
+            Product.objects.filter(pk__in=product_ids).delete()
+            collection.delete()
+            user.delete()
@@ -0,0 +1,39 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from core import renderers
+from store import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's stdlib JSON renderer and parser with core.renderers' orjson pair on large product "
+        'and order pages, and check that both render byte-identical JSON. Load data with generate_fixtures first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='products and orders per page')
+        parser.add_argument('--rounds', type=int, default=20, help='timed renders and parses per page')
+
+    def handle(self, *args, **options):
+        if not renderers.is_available():
+            raise CommandError('orjson is not installed; FastJSONRenderer would use the stdlib encoder')
+        benchmark = benchmarks.JSONBenchmark(rows=options['rows'], rounds=options['rounds'])
+        # image urls are built against "testserver", which production ALLOWED_HOSTS never lists
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                report = benchmark.run()
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        self.stdout.write(json.dumps(report, indent=2))
+        for name, result in report.items():
+            self.stderr.write(
+                f'{name:<10} render {result["render_ms_stdlib"]}ms -> {result["render_ms_orjson"]}ms ({result["render_speedup"]}x)  '
+                f'parse {result["parse_ms_stdlib"]}ms -> {result["parse_ms_orjson"]}ms ({result["parse_speedup"]}x)'
+            )
+        different = [name for name, result in report.items() if not result['identical']]
+        if different:
+            raise CommandError(f'FastJSONRenderer rendered different JSON than JSONRenderer for: {", ".join(different)}')
@@ -0,0 +1,35 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from store import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows/sec of ProductSerializer and the compiled fast read path (STORE_FAST_PRODUCT_READS) '
+        'on the same products, and check that both render byte-identical JSON. Load data with generate_fixtures first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='products per page')
+        parser.add_argument('--rounds', type=int, default=50, help='timed pages per serializer')
+        parser.add_argument('--warmup', type=int, default=5, help='untimed pages per serializer')
+
+    def handle(self, *args, **options):
+        benchmark = benchmarks.SerializerBenchmark(rows=options['rows'], rounds=options['rounds'], warmup=options['warmup'])
+        # image urls are built against "testserver", which production ALLOWED_HOSTS never lists
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                report = benchmark.run()
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        self.stdout.write(json.dumps(report, indent=2))
+        self.stderr.write(
+            f'ProductSerializer {report["serializer"]["rows_per_second"]} rows/s -> '
+            f'fast reader {report["fast_reader"]["rows_per_second"]} rows/s ({report["speedup"]}x)'
+        )
+        if not report['identical']:
+            raise CommandError('the fast read path rendered different JSON than ProductSerializer')
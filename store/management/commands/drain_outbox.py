@@ -0,0 +1,16 @@
+import json
+
+from django.core.management.base import BaseCommand
+from store import outbox
+
+
+class Command(BaseCommand):
+    help = 'Dispatch pending outbox events once (what the drain_outbox Celery task does on a schedule)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--max-batches', type=int, default=None)
+
+    def handle(self, *args, **options):
+        metrics = outbox.drain(batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write(json.dumps(metrics, indent=2))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from store import catalog_io
+
+
+class Command(BaseCommand):
+    help = 'Stream every product to a CSV or JSONL file in the format import_catalog reads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='output file (.csv, .jsonl, optionally .gz) or - for stdout')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None, dest='fmt')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.monotonic()
+        file = catalog_io.open_text(path, 'w')
+        try:
+            exported = catalog_io.export_products(file, catalog_io.detect_format(path, options['fmt']), options['batch_size'])
+        finally:
+            if path != '-':
+                file.close()
+        elapsed = time.monotonic() - started
+        if path != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'{exported} products exported in {elapsed:.1f}s ({exported / elapsed if elapsed else 0:.0f} rows/s)'
+            ))
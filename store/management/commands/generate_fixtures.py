@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from likes.counters import reconcile_like_counts
+from store import cache as catalog_cache
+from store import autocomplete, search, synthetic
+from store.counts import reconcile_collection_counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk insert a reproducible synthetic dataset (collections, products, users/customers, carts, orders, '
+        'reviews, tags, likes). The same --seed and counts always produce the same data. '
+        f'Generated users log in with the password "{synthetic.PASSWORD}".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='multiplier for the default counts (100 gives ~1M products)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-index', action='store_true', help='do not rebuild the search index afterwards')
+        for name, count in synthetic.BASE_COUNTS.items():
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int, default=None, dest=name, help=f'override the count (default {count} x scale)')
+
+    def handle(self, *args, **options):
+        counts = synthetic.scaled_counts(options['scale'], {name: options[name] for name in synthetic.BASE_COUNTS})
+        self.stdout.write('Generating: ' + ', '.join(f'{count} {name}' for name, count in counts.items()))
+        started = time.monotonic()
+        generator = synthetic.FixtureGenerator(counts, seed=options['seed'], batch_size=options['batch_size'], stdout=self.stdout)
+        try:
+            generator.generate()
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        # the bulk inserts bypassed the signal handlers that keep derived data in sync
+        reconcile_collection_counts()
+        reconcile_like_counts()
+        if not options['skip_index']:
+            self.stdout.write('Rebuilding the product search index ....')
+            search.rebuild_index(batch_size=options['batch_size'])
+        catalog_cache.invalidate()
+        autocomplete.mark_stale()
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.1f}s'))
@@ -0,0 +1,125 @@
+import collections
+import itertools
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from store import cache as catalog_cache
+from store import autocomplete, catalog_io, search
+from store.counts import reconcile_collection_counts
+
+
+def _close_connections():
+    # a forked worker must never talk over the parent's database socket
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a CSV or JSONL product feed into the catalog in batches. Rows with an id are upserted, '
+        'rows without one are inserted. Columns: ' + ', '.join(catalog_io.FIELDS) + '. '
+        'collection is an id or a title, promotions are ids separated by "|".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='feed file (.csv, .jsonl, optionally .gz) or - for stdin')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None, dest='fmt')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=1, help='writer processes (use a server database, not SQLite)')
+        parser.add_argument('--create-collections', action='store_true', help='create collections named in the feed that do not exist')
+        parser.add_argument('--max-errors', type=int, default=100, help='abort after this many bad rows')
+        parser.add_argument('--dry-run', action='store_true', help='parse and validate only')
+
+    def handle(self, *args, **options):
+        path, batch_size = options['path'], options['batch_size']
+        fmt = catalog_io.detect_format(path, options['fmt'])
+        parser = catalog_io.RowParser(create_collections=options['create_collections'] and not options['dry_run'])
+        self.errors, self.max_errors = 0, options['max_errors']
+        self.collection_ids = set()
+
+        with catalog_io.open_text(path, 'r') as file:
+            batches = self.parse_batches(parser, catalog_io.read_rows(file, fmt), batch_size)
+            started = time.monotonic()
+            if options['dry_run']:
+                written, unindexed = sum(len(batch) for batch in batches), 0
+            elif options['workers'] > 1:
+                written, unindexed = self.write_parallel(batches, options['workers'], started)
+            else:
+                written, unindexed = self.write_serial(batches, started)
+            elapsed = time.monotonic() - started
+
+        if not options['dry_run'] and written:
+            catalog_io.reset_product_sequence()
+            if unindexed:
+                self.stdout.write(self.style.WARNING(
+                    f'{unindexed} new rows came back without ids (no RETURNING on this database): '
+                    'their promotions were not linked, rebuilding the search index'
+                ))
+                search.rebuild_index()
+            reconcile_collection_counts()
+            catalog_cache.invalidate(self.collection_ids)
+            autocomplete.mark_stale()
+
+        rate = written / elapsed if elapsed else 0
+        verb = 'validated' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{written} rows {verb} in {elapsed:.1f}s ({rate:.0f} rows/s), {self.errors} rows rejected'
+        ))
+
+    def parse_batches(self, parser, rows, batch_size):
+        while True:
+            batch = []
+            for line, raw in itertools.islice(rows, batch_size):
+                try:
+                    batch.append(parser.parse(raw))
+                except catalog_io.RowError as error:
+                    self.errors += 1
+                    self.stderr.write(f'line {line}: {error}')
+                    if self.errors >= self.max_errors:
+                        raise CommandError(f'aborting after {self.errors} bad rows')
+            if not batch:
+                return
+            self.collection_ids.update(row['collection_id'] for row in batch)
+            yield batch
+
+    def collect(self, result):
+        unindexed, previous_collection_ids = result
+        self.collection_ids.update(previous_collection_ids)
+        return unindexed
+
+    def progress(self, written, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{written} rows written ({written / elapsed if elapsed else 0:.0f} rows/s)')
+
+    def write_serial(self, batches, started):
+        written = unindexed = 0
+        for batch in batches:
+            unindexed += self.collect(catalog_io.write_batch(batch))
+            written += len(batch)
+            self.progress(written, started)
+        return written, unindexed
+
+    def write_parallel(self, batches, workers, started):
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            raise CommandError('--workers needs the fork start method (not available on this platform)')
+        _close_connections()
+        written = unindexed = 0
+        pending = collections.deque()
+        with context.Pool(workers, initializer=_close_connections) as pool:
+            # keep only a couple of batches per worker in flight so the feed is never read ahead into memory
+            for batch in batches:
+                pending.append((len(batch), pool.apply_async(catalog_io.write_batch, (batch,))))
+                while len(pending) >= workers * 2:
+                    size, result = pending.popleft()
+                    unindexed += self.collect(result.get())
+                    written += size
+                    self.progress(written, started)
+            while pending:
+                size, result = pending.popleft()
+                unindexed += self.collect(result.get())
+                written += size
+                self.progress(written, started)
+        return written, unindexed
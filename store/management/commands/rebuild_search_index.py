@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from store import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding the product search index ....')
+        indexed = search.rebuild_index(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'{indexed} products indexed'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from store.counts import reconcile_collection_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized Collection.products_count column from the product table'
+
+    def handle(self, *args, **options):
+        updated = reconcile_collection_counts()
+        self.stdout.write(self.style.SUCCESS(f'{updated} collections reconciled'))
@@ -0,0 +1,26 @@
+from core.instrumentation import Metric
+from store import cache as catalog_cache
+from store import outbox
+
+
+def catalog_cache_metrics():
+    stats = catalog_cache.stats()
+    return [
+        Metric('store_catalog_cache_events_total', 'counter', 'Catalog cache lookups by result', [
+            ({'result': name}, stats[name]) for name in ('hits', 'misses', 'bypasses')
+        ]),
+        # version bumps are not lookups, they get their own counter
+        Metric('store_catalog_cache_invalidations_total', 'counter', 'Catalog cache version bumps', [({}, stats['invalidations'])]),
+        Metric('store_catalog_cache_hit_ratio', 'gauge', 'Catalog cache hit ratio since start', [({}, stats['hit_ratio'])]),
+    ]
+
+
+def outbox_metrics():
+    # derived from the OutboxEvent table, so every web process reports what the Celery drainer did
+    stats = outbox.metrics()
+    return [
+        Metric('store_outbox_events', 'gauge', 'Outbox events in the table by state (processed ones until purged)', [
+            ({'state': state}, stats[state]) for state in ('pending', 'dead', 'processed')
+        ]),
+        Metric('store_outbox_lag_seconds', 'gauge', 'Age of the oldest pending event', [({}, stats['lag_s'])]),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 11:20
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_products_count(apps, schema_editor):
+    Collection = apps.get_model('store', 'Collection')
+    Product = apps.get_model('store', 'Product')
+    live_count = (
+        Product.objects
+        .filter(collection=OuterRef('pk'))
+        .order_by()
+        .values('collection')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Collection.objects.update(
+        products_count=Coalesce(Subquery(live_count, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_productsearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='products_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_products_count, migrations.RunPython.noop),
+    ]
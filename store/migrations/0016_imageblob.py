@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-17 16:20
+
+import store.storage
+import store.validatores
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_image_blobs(apps, schema_editor):
+    ImageBlob = apps.get_model('store', 'ImageBlob')
+    ProductImage = apps.get_model('store', 'ProductImage')
+    references = ProductImage.objects.exclude(image='').order_by().values('image').annotate(total=Count('id'))
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=row['image'], refcount=row['total']) for row in references.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_productimage_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(storage=store.storage.image_storage, upload_to='store/images/', validators=[store.validatores.validate_file_size]),
+        ),
+        migrations.RunPython(populate_image_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 17:05
+
+from django.db import migrations
+from store.search import build_terms
+
+
+def backfill_search_terms(apps, schema_editor):
+    # 0012 created the index empty; products without terms would never match a search
+    Product = apps.get_model('store', 'Product')
+    ProductSearchTerm = apps.get_model('store', 'ProductSearchTerm')
+    products = Product.objects.filter(search_terms__isnull=True).only('id', 'title', 'description').order_by('id')
+    terms = []
+    for product in products.iterator(chunk_size=1000):
+        terms.extend(
+            ProductSearchTerm(product_id=product.pk, term=term, weight=weight)
+            for term, weight in build_terms(product).items()
+        )
+        if len(terms) >= 10000:
+            ProductSearchTerm.objects.bulk_create(terms, batch_size=1000)
+            terms = []
+    ProductSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_imageblob'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_terms, migrations.RunPython.noop),
+    ]
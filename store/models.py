@@ -5,6 +5,7 @@ from django.contrib import admin
 from phonenumber_field.modelfields import PhoneNumberField
 import uuid
 
+from store.storage import image_storage
 from store.validatores import validate_file_size
 
 def generate_uuid_hex():
@@ -21,9 +22,21 @@ class Collection(models.Model):
     featured_product = models.ForeignKey('Product', on_delete=models.SET_NULL, null=True, related_name="+")
     # here we are having a issue --> Reverse queryname for the 'store.collection.featured_product' clashed with field name 'store.product.collection' -----> to solve that either we can add related_name to something or if we don;t want to take load we make related_name ="+".
     # Now after using the '+' , django will not Create the reverse relation 
+    # denormalized count kept up to date by the product signal handlers (see reconcile_collection_counts)
+    products_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        # an update from a stale instance (serializer, admin) must not overwrite the
+        # F() adjustments made since it was loaded; only the counters write products_count
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'products_count'
+            ]
+        super().save(*args, **kwargs)
     
     class Meta:
         ordering = ['title']
@@ -41,14 +54,60 @@ class Product(models.Model):
 
     def __str__(self):
         return self.title
-    
+
+    # remembering the collection the row was loaded with lets the signal handlers
+    # tell when a product moved between collections without an extra query
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_collection_id = instance.__dict__.get('collection_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_collection_id = self.collection_id
+
     class Meta:
-        ordering = ['title']    
-    
+        ordering = ['title']
+        # back the keyset pagination orderings (title, id) and (price, id)
+        indexes = [
+            models.Index(fields=['title', 'id'], name='store_product_title_id_idx'),
+            models.Index(fields=['price', 'id'], name='store_product_price_id_idx'),
+        ]
+
+# Inverted index over product title/description tokens, maintained by store/search.py
+class ProductSearchTerm(models.Model):
+    term = models.CharField(max_length=64)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.FloatField()
+
+    class Meta:
+        unique_together = [['term', 'product']]
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='store/images/', validators=[validate_file_size])
+    image = models.ImageField(upload_to='store/images/', storage=image_storage, validators=[validate_file_size])
     alt_text = models.CharField(max_length=255, blank=True)
+    # resized WebP copies written by the generate_image_variants task:
+    # [{"width": 160, "height": 120, "name": "store/images/variants/..."}, ...] smallest first
+    variants = models.JSONField(default=list, blank=True, editable=False)
+
+    # lets the signal handlers tell a replaced upload from a plain save
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image_name = instance.__dict__.get('image')
+        return instance
+
+# One row per stored image file; refcount is the number of ProductImage rows
+# using it (store.images.retain/release), the file goes when it drops to zero
+class ImageBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
 
 
 class Customer(models.Model):
@@ -94,6 +153,10 @@ class Order(models.Model):
         permissions = [
             ('cancel_order', 'can cancel order')
         ]
+        indexes = [
+            models.Index(fields=['placed_at', 'id'], name='store_order_placed_id_idx'),
+            models.Index(fields=['customer', 'placed_at', 'id'], name='store_order_cust_placed_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.PROTECT, related_name='items')
@@ -101,6 +164,21 @@ class OrderItem(models.Model):
     quantity = models.PositiveSmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
 
+# Events written in the same transaction as the change that caused them and
+# dispatched afterwards by the store.tasks.drain_outbox Celery task
+class OutboxEvent(models.Model):
+    topic = models.CharField(max_length=64)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['processed_at', 'id'], name='store_outbox_pending_idx'),
+        ]
+
 class Address(models.Model):
     zip_code = models.PositiveSmallIntegerField()
     street = models.CharField(max_length=255)
@@ -131,4 +209,9 @@ class Review(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     name = models.CharField(max_length=255)
     description = models.TextField()
-    date = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'date', 'id'], name='store_review_prod_date_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,163 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from store.models import Order, OutboxEvent
+from store.signals import order_created
+
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = 'order_created'
+
+
+def max_attempts():
+    return getattr(settings, 'STORE_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+# unprocessed events are pending until they have used up their attempts, dead afterwards
+def pending_filter():
+    return Q(processed_at__isnull=True, attempts__lt=max_attempts())
+
+
+def dead_filter():
+    return Q(processed_at__isnull=True, attempts__gte=max_attempts())
+
+
+def publish(topic, **payload):
+    # call inside the transaction that makes the change, the event commits or rolls back with it
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+class ReceiverFailed(Exception):
+    pass
+
+
+def dispatch_order_created(events):
+    orders = Order.objects.in_bulk([event.payload['order_id'] for event in events])
+    failures = {}
+    for event in events:
+        order = orders.get(event.payload['order_id'])
+        if order is None:
+            continue
+        # a savepoint per event: send_robust swallows a receiver's database error, which
+        # on PostgreSQL would leave the batch transaction aborted and the attempts unrecorded;
+        # rolling back to it also undoes the event's other receivers, it is retried as a whole
+        try:
+            with transaction.atomic():
+                errors = [
+                    f'{getattr(receiver, "__qualname__", receiver)}: {result!r}'
+                    for receiver, result in order_created.send_robust(Order, order=order)
+                    if isinstance(result, Exception)
+                ]
+                if errors:
+                    raise ReceiverFailed('\n'.join(errors))
+        except ReceiverFailed as error:
+            failures[event.pk] = str(error)
+    return failures
+
+
+DISPATCHERS = {
+    ORDER_CREATED: dispatch_order_created,
+}
+
+
+def drain_batch(batch_size):
+    # SELECT ... FOR UPDATE SKIP LOCKED lets several drainers split the backlog;
+    # on databases without it (SQLite) the query is a plain SELECT
+    events = OutboxEvent.objects.filter(pending_filter()).order_by('id')
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            events = events.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        events = list(events[:batch_size])
+        if not events:
+            return 0, 0
+
+        failures = {}
+        by_topic = {}
+        for event in events:
+            by_topic.setdefault(event.topic, []).append(event)
+        for topic, topic_events in by_topic.items():
+            dispatcher = DISPATCHERS.get(topic)
+            if dispatcher is None:
+                failures.update({event.pk: f'No dispatcher for topic {topic!r}' for event in topic_events})
+                continue
+            failures.update(dispatcher(topic_events))
+
+        # delivery is at-least-once: an event with a failed receiver is retried
+        now = timezone.now()
+        for event in events:
+            event.attempts += 1
+            if event.pk in failures:
+                event.last_error = failures[event.pk]
+                logger.warning('Outbox event %s (%s) failed: %s', event.pk, event.topic, event.last_error)
+            else:
+                event.processed_at = now
+                event.last_error = ''
+        OutboxEvent.objects.bulk_update(events, ['attempts', 'processed_at', 'last_error'])
+    return len(events), len(failures)
+
+
+def drain(batch_size=None, max_batches=None):
+    batch_size = batch_size or getattr(settings, 'STORE_OUTBOX_BATCH_SIZE', 500)
+    max_batches = max_batches or getattr(settings, 'STORE_OUTBOX_MAX_BATCHES', 20)
+
+    # dead events are never retried, they must not count towards the lag
+    oldest = (
+        OutboxEvent.objects
+        .filter(pending_filter())
+        .order_by('processed_at', 'id')
+        .values_list('created_at', flat=True)
+        .first()
+    )
+    started = time.perf_counter()
+    processed = failed = 0
+    for _ in range(max_batches):
+        handled, batch_failed = drain_batch(batch_size)
+        processed += handled - batch_failed
+        failed += batch_failed
+        if handled < batch_size:
+            break
+    elapsed = time.perf_counter() - started
+
+    metrics = {
+        'last_run_at': timezone.now().isoformat(),
+        'processed': processed,
+        'failed': failed,
+        'elapsed_s': round(elapsed, 4),
+        'events_per_s': round(processed / elapsed, 1) if elapsed else 0.0,
+        # how long the oldest pending event had been waiting when the run started
+        'lag_s': round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0.0,
+    }
+    if processed or failed:
+        logger.info('Outbox drained %s events (%s failed) in %.3fs, lag %.3fs',
+                    processed, failed, elapsed, metrics['lag_s'])
+    return metrics
+
+
+def purge_processed():
+    # processed events, and dead ones once they are as old, after the retention period
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'STORE_OUTBOX_RETENTION_DAYS', 7))
+    dead = OutboxEvent.objects.filter(dead_filter(), created_at__lt=cutoff)
+    dead_count = dead.count()
+    if dead_count:
+        logger.warning('Purging %s dead outbox events older than %s', dead_count, cutoff)
+    deleted, _ = OutboxEvent.objects.filter(Q(processed_at__lt=cutoff) | Q(pk__in=dead.values('pk'))).delete()
+    return deleted
+
+
+def metrics():
+    # read from the table on every call, so every process reports the same numbers
+    counts = OutboxEvent.objects.aggregate(
+        pending=Count('id', filter=pending_filter()),
+        dead=Count('id', filter=dead_filter()),
+        processed=Count('id', filter=Q(processed_at__isnull=False)),
+        oldest_pending=Min('created_at', filter=pending_filter()),
+    )
+    oldest = counts.pop('oldest_pending')
+    counts['lag_s'] = round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0.0
+    return counts
@@ -1,6 +1,189 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class DefaultPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+# Keyset (seek) pagination: pages continue from the key of the last row seen
+# (WHERE (title, id) > (:title, :id) ORDER BY title, id LIMIT n) instead of an
+# OFFSET, and no COUNT(*) is issued, so page 10000 costs the same as page one.
+class KeysetPagination(BasePagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'paginate'
+    mode_query_value = 'keyset'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        return (request.query_params.get(cls.mode_query_param) == cls.mode_query_value
+                or cls.cursor_query_param in request.query_params)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_keyset(self, queryset, view):
+        # explicit ordering (OrderingFilter) wins, then the view's keyset, then Meta.ordering
+        ordering = list(queryset.query.order_by)
+        if not ordering:
+            ordering = list(getattr(view, 'keyset_ordering', None) or queryset.model._meta.ordering)
+        keys = [key for key in ordering if isinstance(key, str) and '__' not in key and key not in ('?', '-?')]
+        keys = ['id' if key == 'pk' else '-id' if key == '-pk' else key for key in keys]
+        if not any(key.lstrip('-') == 'id' for key in keys):
+            # id breaks ties and runs in the same direction so one index serves the scan
+            keys.append('-id' if keys and keys[-1].startswith('-') else 'id')
+        return keys
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_keyset(queryset, view)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+
+        ordering = [self._flip(key) for key in self.keys] if reverse else self.keys
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(self.build_seek_filter(ordering, cursor['v']))
+            except (TypeError, ValueError, ValidationError):
+                # well-formed but tampered: the values do not fit the key columns
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.first_values = self.row_values(rows[0]) if rows else None
+        self.last_values = self.row_values(rows[-1]) if rows else None
+        return rows
+
+    def build_seek_filter(self, ordering, values):
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y), per-key direction aware
+        condition = Q()
+        for position, key in enumerate(ordering):
+            field = key.lstrip('-')
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            clause = Q(**{f'{field}__{lookup}': values[position]})
+            for previous_key, previous_value in zip(ordering[:position], values[:position]):
+                clause &= Q(**{previous_key.lstrip('-'): previous_value})
+            condition |= clause
+        return condition
+
+    def row_values(self, row):
+        fields = [key.lstrip('-') for key in self.keys]
+        if isinstance(row, dict):
+            return [self._to_json(row[field]) for field in fields]
+        return [self._to_json(getattr(row, field)) for field in fields]
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.mode_query_param, self.mode_query_value)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            cursor = json.loads(payload)
+            values = cursor['v']
+            # one scalar per key; anything else is a forged cursor
+            if not isinstance(values, list) or len(values) != len(self.keys):
+                raise ValueError
+            if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+                raise ValueError
+            return {'v': values, 'r': bool(cursor.get('r'))}
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_values is None:
+            return None
+        return self.encode_cursor(self.last_values, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_values is None:
+            # walked past the end, previous is the first page
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.first_values, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    @staticmethod
+    def _flip(key):
+        return key[1:] if key.startswith('-') else '-' + key
+
+    @staticmethod
+    def _to_json(value):
+        # full precision on purpose, a truncated timestamp would skip or repeat rows
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
+
+
+# Lets a view keep its regular pagination and switch to keyset pagination per
+# request with ?paginate=keyset (or whenever a cursor is sent).
+class KeysetSelectableMixin:
+    keyset_pagination_class = KeysetPagination
+    keyset_ordering = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.keyset_pagination_class is not None and self.keyset_pagination_class.is_requested(self.request):
+                self._paginator = self.keyset_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,111 @@
+import math
+import re
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, FloatField, IntegerField, Max, OuterRef, Q, Subquery, Sum, When
+from rest_framework.filters import BaseFilterBackend
+from store.models import Product, ProductSearchTerm
+
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower())]
+
+
+def title_boost():
+    return getattr(settings, 'STORE_SEARCH_TITLE_BOOST', 3.0)
+
+
+def build_terms(product):
+    # log-damped term frequency per field, title hits weigh title_boost() times more
+    weights = Counter()
+    for boost, text in ((title_boost(), product.title), (1.0, product.description)):
+        for term, count in Counter(tokenize(text)).items():
+            weights[term] += boost * (1 + math.log(count))
+    return weights
+
+
+def index_products(products, batch_size=1000):
+    products = list(products)
+    with transaction.atomic():
+        ProductSearchTerm.objects.filter(product_id__in=[product.pk for product in products]).delete()
+        ProductSearchTerm.objects.bulk_create(
+            [
+                ProductSearchTerm(product_id=product.pk, term=term, weight=weight)
+                for product in products
+                for term, weight in build_terms(product).items()
+            ],
+            batch_size=batch_size,
+        )
+
+
+def rebuild_index(batch_size=1000, stdout=None):
+    # each batch swaps its products' terms in one transaction, so search keeps
+    # answering from the old terms while the rebuild runs (terms of deleted
+    # products go with them, the foreign key cascades)
+    batch, indexed = [], 0
+    products = Product.objects.only('id', 'title', 'description').order_by('id')
+    for product in products.iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) == batch_size:
+            index_products(batch, batch_size)
+            indexed += len(batch)
+            batch = []
+            if stdout is not None:
+                stdout.write(f'{indexed} products indexed')
+    if batch:
+        index_products(batch, batch_size)
+        indexed += len(batch)
+    return indexed
+
+
+def parse_query(query):
+    terms = list(dict.fromkeys(tokenize(query)))
+    return terms[:MAX_QUERY_TERMS]
+
+
+def search_products(queryset, query):
+    terms = parse_query(query)
+    if not terms:
+        return queryset
+
+    # every term must match; the last one is matched as a prefix so results
+    # keep up with a search box that is still being typed into
+    conditions = [Q(term=term) for term in terms[:-1]] + [Q(term__startswith=terms[-1])]
+    matched = {
+        f'matched_{position}': Max(Case(When(condition, then=1), default=0, output_field=IntegerField()))
+        for position, condition in enumerate(conditions)
+    }
+    matches = (
+        ProductSearchTerm.objects
+        .filter(reduce(or_, conditions))
+        .values('product_id')
+        .annotate(rank=Sum('weight'), **matched)
+        .filter(**{name: 1 for name in matched})
+    )
+    rank = Subquery(matches.filter(product_id=OuterRef('pk')).values('rank')[:1], output_field=FloatField())
+
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    return (
+        queryset
+        .filter(pk__in=matches.values('product_id'))
+        .annotate(search_rank=rank)
+        .order_by('-search_rank', *ordering)
+    )
+
+
+# Drop-in replacement for SearchFilter on ProductViewSet, backed by the
+# ProductSearchTerm inverted index instead of LIKE '%term%' scans.
+class ProductSearchFilter(BaseFilterBackend):
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        return search_products(queryset, request.query_params.get(self.search_param, ''))
@@ -1,45 +1,139 @@
 from decimal import Decimal
-from django.db import  transaction
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from store.carts import get_cart_store
+from store.checkout import CartUnavailable, InvalidQuantity, OutOfStock, place_order
 from store.models import Product, Collection, Review, Cart, CartItem, Customer, Order, OrderItem, ProductImage
-from store.signals import order_created
+from tags.models import TaggedItem
+
+
+FIELDS_PARAM, OMIT_PARAM, EXPAND_PARAM, INCLUDE_PARAM = 'fields', 'omit', 'expand', 'include'
+
+
+def split_param(query_params, name):
+    return [part.strip() for value in query_params.getlist(name) for part in value.split(',') if part.strip()]
+
+
+# Sparse fieldsets for read requests: ?fields=id,title keeps only those fields,
+# ?omit=description drops some, ?expand=collection swaps a related id for the
+# nested object (Meta.expandable_fields). Applies to the top-level serializer
+# only; nested serializers always render in full. Views call select_fields()
+# too, to load only what will be rendered.
+class DynamicFieldsMixin:
+    @classmethod
+    def select_fields(cls, query_params):
+        available = list(cls.Meta.fields)
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        wanted, omitted, expanded = (split_param(query_params, name) for name in (FIELDS_PARAM, OMIT_PARAM, EXPAND_PARAM))
+        errors = {}
+        for param, names, allowed in ((FIELDS_PARAM, wanted, available), (OMIT_PARAM, omitted, available), (EXPAND_PARAM, expanded, expandable)):
+            unknown = sorted(set(names) - set(allowed))
+            if unknown:
+                errors[param] = [f'Unknown field(s): {", ".join(unknown)}. Choose from: {", ".join(allowed)}.']
+        if errors:
+            raise serializers.ValidationError(errors)
+        names = [name for name in available if (not wanted or name in wanted or name in expanded) and name not in omitted]
+        return names, {name for name in expanded if name in names}
+
+    def is_root_serializer(self):
+        return self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD') or not self.is_root_serializer():
+            return fields
+        names, expanded = self.select_fields(request.query_params)
+        for name in expanded:
+            fields[name] = self.Meta.expandable_fields[name]()
+        return {name: fields[name] for name in names}
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    # resized WebP copies, smallest first; empty until the worker has processed the upload
+    variants = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     def create(self, validated_data):
         product_id = self.context['product_id']
         return ProductImage.objects.create(product_id=product_id, **validated_data)
+
+    def file_url(self, name):
+        # same absolute/relative rule as the image field itself
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_variants(self, image: ProductImage):
+        return [
+            {'width': variant['width'], 'height': variant['height'], 'url': self.file_url(variant['name'])}
+            for variant in image.variants
+        ]
+
+    def get_srcset(self, image: ProductImage):
+        return ', '.join(f'{self.file_url(variant["name"])} {variant["width"]}w' for variant in image.variants)
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'variants', 'srcset']
+
+
+class ProductCollectionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Collection
+        fields = ['id', 'title']
+
+
+def product_tags(product_ids):
+    # one query for a whole page, see TaggedItemManager.get_tags_for_many
+    tags = TaggedItem.objects.get_tags_for_many(Product, product_ids)
+    return {pk: [{'id': tag.id, 'label': tag.label} for tag in product_tags] for pk, product_tags in tags.items()}
 
 
 # Product Serializer with price_with_tax field
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     # assuming a tax rate of 20%
     price_with_tax = serializers.SerializerMethodField(method_name='calculate_price_with_tax') 
     images = ProductImageSerializer(many=True, read_only=True)
     class Meta:
         model = Product
         fields = ['id', 'title', 'description', 'price', 'inventory', 'collection', 'price_with_tax', 'images']
+        expandable_fields = {'collection': lambda: ProductCollectionSerializer(read_only=True)}
+        # ?include=tags appends "tags": [{"id", "label"}]; the view loads them for the page (context['tags'])
+        includable = ['tags']
+
+    @classmethod
+    def select_includes(cls, query_params):
+        included = split_param(query_params, INCLUDE_PARAM)
+        unknown = sorted(set(included) - set(cls.Meta.includable))
+        if unknown:
+            raise serializers.ValidationError({INCLUDE_PARAM: [f'Unknown include(s): {", ".join(unknown)}. Choose from: {", ".join(cls.Meta.includable)}.']})
+        return set(included)
 
     def calculate_price_with_tax(self, product: Product):
         return product.price * Decimal(1.2)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'tags' in self.context:
+            data['tags'] = self.context['tags'].get(instance.pk, [])
+        return data
     
 
 
 # Collection Serializer with products_count field
-class CollectionSerializer(serializers.ModelSerializer):
+class CollectionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     products_count = serializers.SerializerMethodField(method_name='get_products_count')
     class Meta:
         model = Collection
         fields = ['id', 'title', 'products_count']
 
     def get_products_count(self, collection: Collection):
-        return collection.products.count()
+        # CollectionViewSet annotates the live count in the list query; otherwise use the denormalized column
+        return getattr(collection, 'annotated_products_count', collection.products_count)
     
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ['id', 'date', 'name', 'description']
@@ -73,15 +167,41 @@ class CartSerializer(serializers.ModelSerializer):
 
     def get_total_price(self, cart: Cart):
         return sum([item.quantity * item.product.price for item in cart.items.all() ])
+
+    def create(self, validated_data):
+        return get_cart_store().create_cart()
+
     class Meta:
         model = Cart
         fields = ['id', 'items', 'total_price']
 
 
+# POST of a list to store/carts/{id}/items/ ---> validates every product in one
+# query and adds all lines with a single upsert
+class BulkAddCartItemSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        product_ids = {item['product_id'] for item in attrs}
+        found = set(Product.objects.filter(pk__in=product_ids).values_list('id', flat=True))
+        missing = sorted(product_ids - found)
+        if missing:
+            raise serializers.ValidationError(f'No product with given id was found: {missing}')
+        return attrs
+
+    def save(self, **kwargs):
+        lines = [(item['product_id'], item['quantity']) for item in self.validated_data]
+        self.instance = get_cart_store().add_items(self.context['cart_id'], lines)
+        if self.instance is None:
+            raise NotFound('No cart with given id was found')
+        return self.instance
+
+
 class AddCartItemSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
 
     def validate_product_id(self, value):
+        if isinstance(self.parent, BulkAddCartItemSerializer):
+            # checked for the whole batch at once
+            return value
         if not Product.objects.filter(pk=value).exists():
             raise serializers.ValidationError('No product with given id was found')
         return value
@@ -90,27 +210,33 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         cart_id = self.context['cart_id']
         product_id = self.validated_data['product_id']
         quantity = self.validated_data['quantity']
-        try:
-            cart_item = CartItem.objects.get(cart_id=cart_id, product_id=product_id)
-            # updating the existing item
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            # creating the new item
-            self.instance = CartItem.objects.create(cart_id=cart_id, **self.validated_data)
+        # merges into the existing line for the product if there is one
+        self.instance = get_cart_store().add_item(cart_id, product_id, quantity)
+        if self.instance is None:
+            raise NotFound('No cart with given id was found')
         return self.instance
 
     class Meta:
         model = CartItem
         fields = ['id', 'product_id', 'quantity']
+        extra_kwargs = {'quantity': {'min_value': 1}}
+        list_serializer_class = BulkAddCartItemSerializer
 
     
 
 class UpdateCartItemSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        if 'quantity' not in validated_data:
+            return instance
+        cart_item = get_cart_store().update_item(instance.cart_id, instance.id, validated_data['quantity'])
+        if cart_item is None:
+            raise NotFound('No cart item with given id was found')
+        return cart_item
+
     class Meta:
         model = CartItem
         fields = ['quantity']
+        extra_kwargs = {'quantity': {'min_value': 1}}
 
 class CustomerSerializer(serializers.ModelSerializer):
     user_id = serializers.IntegerField(read_only=True)
@@ -130,43 +256,38 @@ class UpdateOrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['payment_status']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     class Meta:
         model = Order
         fields = ['id', 'customer', 'placed_at', 'payment_status', 'items']
 
+# lean list representation ---> store/orders/?view=summary
+class OrderSummarySerializer(serializers.ModelSerializer):
+    items_count = serializers.IntegerField(read_only=True)
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    class Meta:
+        model = Order
+        fields = ['id', 'customer', 'placed_at', 'payment_status', 'items_count', 'total_price']
+
 class CreateOrderSerializer(serializers.Serializer):
     cart_id = serializers.UUIDField()
 
     def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk=cart_id).exists():
+        # cart ids are stored as 32 char hex strings
+        cart_id = cart_id.hex
+        self.cart_lines = get_cart_store().get_lines(cart_id)
+        if self.cart_lines is None:
             raise serializers.ValidationError('No cart wiht given id found')
-        if CartItem.objects.filter(cart_id=cart_id).count() == 0:
+        if not self.cart_lines:
             raise serializers.ValidationError('The Cart is empty')
         return cart_id
 
     def save(self, **kwargs):
-        with transaction.atomic():
-            # print(self.validated_data['cart_id'])
-            # print(self.context['user_id'])
-            cart_id =  self.validated_data['cart_id']
-
-            customer = Customer.objects.get(user_id=self.context['user_id'])
-            order = Order.objects.create(customer=customer)
-
-            cart_items = CartItem.objects.select_related('product').filter(cart_id=cart_id)
-            order_items = [
-                OrderItem(
-                    order=order,
-                    product = item.product,
-                    price = item.product.price,
-                    quantity = item.quantity
-                ) for item in cart_items
-            ]
-
-            OrderItem.objects.bulk_create(order_items)
-
-            Cart.objects.filter(pk=cart_id).delete()
-            order_created.send_robust(self.__class__, order=order)
-            return order
\ No newline at end of file
+        try:
+            return place_order(self.context['user_id'], self.validated_data['cart_id'], self.cart_lines, get_cart_store())
+        except (OutOfStock, InvalidQuantity) as error:
+            raise serializers.ValidationError({'cart_id': [str(error)]})
+        except CartUnavailable:
+            # checked out by a concurrent request since validate_cart_id
+            raise serializers.ValidationError({'cart_id': ['No cart wiht given id found']})
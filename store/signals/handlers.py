@@ -1,10 +1,129 @@
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from django.dispatch import receiver
-from django.db.models.signals import post_save
-from store.models import Customer
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from store import cache as catalog_cache
+from store import search
+from store import images
+from store.autocomplete import index as autocomplete_index, PRODUCT, COLLECTION
+from store.models import Customer, Product, ProductImage, Collection, Promotion, Review
+from store.tasks import generate_image_variants
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_for_new_user(sender, **kwargs):
     if kwargs['created']:
         Customer.objects.create(user=kwargs['instance'])
 
+
+# Catalog cache invalidation
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_catalog_for_product(sender, instance, **kwargs):
+    catalog_cache.invalidate([instance.collection_id, getattr(instance, '_loaded_collection_id', None)])
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def invalidate_catalog_for_product_image(sender, instance, **kwargs):
+    collection_id = Product.objects.filter(pk=instance.product_id).values_list('collection_id', flat=True).first()
+    catalog_cache.invalidate([collection_id])
+    # images are part of the product payload, so they move its Last-Modified/ETag too
+    Product.objects.filter(pk=instance.product_id).update(last_update=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_reviews(sender, instance, **kwargs):
+    catalog_cache.bump_version(catalog_cache.review_version_key(instance.product_id))
+
+
+@receiver([post_save, post_delete], sender=Collection)
+def invalidate_catalog_for_collection(sender, instance, **kwargs):
+    catalog_cache.invalidate([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Promotion)
+def invalidate_catalog_for_promotion(sender, instance, **kwargs):
+    catalog_cache.invalidate()
+
+
+@receiver(m2m_changed, sender=Product.promotions.through)
+def invalidate_catalog_for_product_promotions(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    catalog_cache.invalidate([] if reverse else [instance.collection_id])
+
+
+# Denormalized Collection.products_count
+def _adjust_products_count(collection_id, delta):
+    collections = Collection.objects.filter(pk=collection_id)
+    if delta < 0:
+        collections = collections.filter(products_count__gt=0)
+    collections.update(products_count=F('products_count') + delta)
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, **kwargs):
+    previous_collection_id = getattr(instance, '_loaded_collection_id', None)
+    if created:
+        _adjust_products_count(instance.collection_id, 1)
+    elif previous_collection_id is not None and previous_collection_id != instance.collection_id:
+        _adjust_products_count(previous_collection_id, -1)
+        _adjust_products_count(instance.collection_id, 1)
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    _adjust_products_count(instance.collection_id, -1)
+
+
+# Search index maintenance (row deletes cascade to ProductSearchTerm)
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'title', 'description'} & set(update_fields):
+        return
+    search.index_products([instance])
+
+
+# Autocomplete index maintenance
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Collection)
+def add_title_to_autocomplete(sender, instance, **kwargs):
+    kind = PRODUCT if sender is Product else COLLECTION
+    pk, title = instance.pk, instance.title
+    # rows of a rolled-back transaction never reach the index
+    transaction.on_commit(lambda: autocomplete_index.add(kind, pk, title))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Collection)
+def remove_title_from_autocomplete(sender, instance, **kwargs):
+    kind = PRODUCT if sender is Product else COLLECTION
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.remove(kind, pk))
+
+
+# Image blobs and variants. Blobs are refcounted because identical uploads share
+# one file; variants are resized off the request path once the upload is committed
+@receiver(post_save, sender=ProductImage)
+def process_saved_image(sender, instance, created, **kwargs):
+    name = instance.image.name
+    previous = None if created else getattr(instance, '_loaded_image_name', None)
+    if name == previous:
+        return
+    stale, instance.variants = instance.variants, []
+    if stale:
+        ProductImage.objects.filter(pk=instance.pk).update(variants=[])
+    instance._loaded_image_name = name
+    if previous:
+        images.release(previous, stale)
+    if name:
+        images.retain(name)
+        images.restore_if_missing(instance.image)
+        # robust: a broker outage must not fail the upload, the image just stays without variants
+        transaction.on_commit(lambda: generate_image_variants.delay(instance.pk, name), robust=True)
+
+
+@receiver(post_delete, sender=ProductImage)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image.name:
+        images.release(instance.image.name, instance.variants)
@@ -0,0 +1,42 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+
+
+# Stores every file under the SHA-256 of its content, inside the directory
+# upload_to picked: store/images/ab/ab12...ef.jpg. Identical uploads map to
+# one file and names never change meaning, so they can be cached forever.
+# Files are shared between rows; store.images.retain/release refcount them.
+class ContentAddressedStorage(FileSystemStorage):
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():  # chunks() rewinds first, and again when the file is written
+            digest.update(chunk)
+        hexdigest = digest.hexdigest()
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(directory, hexdigest[:2], hexdigest + extension)
+        # an existing file is only trusted once the upload holds a reference to it
+        # (store.images.restore_if_missing runs after retain)
+        if os.path.lexists(self.path(name)):
+            return name
+        # two processes writing the same new blob at once end up with a suffixed twin; harmless
+        return super()._save(name, content)
+
+    def restore(self, name, content):
+        # writes a blob back under its content-addressed name
+        if not os.path.lexists(self.path(name)):
+            super()._save(name, content)
+
+
+_image_storage = None
+
+
+# referenced by ProductImage.image as a callable so migrations do not embed the instance
+def image_storage():
+    global _image_storage
+    if _image_storage is None:
+        _image_storage = ContentAddressedStorage()
+    return _image_storage
@@ -0,0 +1,243 @@
+import array
+import contextlib
+import datetime
+import decimal
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Max
+from likes.models import LikeItem
+from store.models import Cart, CartItem, Collection, Customer, Order, OrderItem, Product, Promotion, Review
+from tags.models import Tag, TaggedItem
+
+
+# row counts at --scale 1; every count is multiplied by the scale
+BASE_COUNTS = {
+    'collections': 20,
+    'promotions': 10,
+    'products': 10_000,
+    'users': 1_000,
+    'carts': 2_000,
+    'orders': 5_000,
+    'reviews': 20_000,
+    'tags': 50,
+    'tagged_items': 20_000,
+    'likes': 20_000,
+}
+PASSWORD = 'fixture-pass'
+HISTORY_DAYS = 365
+# dates are spread over the HISTORY_DAYS before this, so a seed always yields the same timestamps
+BASE_TIME = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+ADJECTIVES = [
+    'Wireless', 'Compact', 'Premium', 'Classic', 'Portable', 'Smart', 'Organic', 'Vintage', 'Ergonomic', 'Rugged',
+    'Slim', 'Deluxe', 'Eco', 'Heavy Duty', 'Mini', 'Pro', 'Ultra', 'Handmade', 'Modern', 'Essential',
+]
+NOUNS = [
+    'Mouse', 'Keyboard', 'Lamp', 'Backpack', 'Bottle', 'Chair', 'Desk', 'Headphones', 'Jacket', 'Kettle',
+    'Blender', 'Notebook', 'Pen', 'Speaker', 'Watch', 'Charger', 'Tent', 'Mug', 'Pillow', 'Shoes',
+    'Camera', 'Tripod', 'Monitor', 'Router', 'Toaster', 'Wallet', 'Umbrella', 'Scarf', 'Drill', 'Sander',
+]
+WORDS = [
+    'durable', 'lightweight', 'everyday', 'stainless', 'steel', 'cotton', 'battery', 'usb', 'water', 'resistant',
+    'travel', 'kitchen', 'office', 'outdoor', 'gift', 'comfortable', 'adjustable', 'warranty', 'fast', 'quiet',
+]
+FIRST_NAMES = ['Asha', 'Ben', 'Chen', 'Dana', 'Eli', 'Fatima', 'Gita', 'Hugo', 'Ines', 'Jonas', 'Kavya', 'Liam', 'Mei', 'Noor', 'Omar', 'Priya']
+LAST_NAMES = ['Sharma', 'Smith', 'Garcia', 'Kim', 'Novak', 'Okafor', 'Rossi', 'Silva', 'Tanaka', 'Weber', 'Khan', 'Lopez']
+
+
+def scaled_counts(scale, overrides=None):
+    counts = {name: max(int(count * scale), 1) for name, count in BASE_COUNTS.items()}
+    counts.update({name: count for name, count in (overrides or {}).items() if count is not None})
+    return counts
+
+
+def max_id(model):
+    return model.objects.aggregate(value=Max('pk'))['value'] or 0
+
+
+def ids_after(model, after):
+    # rows this run inserted; bulk_create does not return ids on every backend (MySQL)
+    ids = array.array('q')
+    ids.extend(model.objects.filter(pk__gt=after).order_by('pk').values_list('pk', flat=True).iterator(chunk_size=10_000))
+    return ids
+
+
+@contextlib.contextmanager
+def explicit_timestamps(model, field_name):
+    # auto_now_add would overwrite the spread-out dates the generator picks
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+# Bulk inserts a reproducible dataset: the same seed and counts always yield the
+# same rows (ids aside), once per database. Nothing goes through save(), so no signals fire; callers
+# rebuild the derived data (search index, collection counts) afterwards.
+class FixtureGenerator:
+    def __init__(self, counts, seed=0, batch_size=5000, stdout=None):
+        self.counts = counts
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.now = BASE_TIME
+        self.run = f'{seed:x}-{self.random.getrandbits(32):08x}'
+
+    def check_fresh(self):
+        # usernames and cart ids come from the seed, a second run with it would collide half-way
+        if get_user_model().objects.filter(username__startswith=f'fx-{self.run}-').exists():
+            raise ValueError(
+                f'a dataset with seed {self.seed} is already in this database; use another --seed or an empty database'
+            )
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def insert(self, model, rows, label):
+        before = max_id(model)
+        batch, inserted = [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                inserted += len(batch)
+                batch = []
+                self.log(f'{label}: {inserted}')
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            inserted += len(batch)
+        self.log(f'{label}: {inserted} inserted')
+        return ids_after(model, before)
+
+    def past(self):
+        return self.now - datetime.timedelta(seconds=self.random.randrange(HISTORY_DAYS * 24 * 60 * 60))
+
+    def price(self):
+        return decimal.Decimal(self.random.randrange(199, 99_999)) / 100
+
+    def sentence(self, words):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words))
+
+    def generate(self):
+        self.check_fresh()
+        rng, counts = self.random, self.counts
+        collections = self.insert(Collection, (
+            Collection(title=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}s {n}') for n in range(counts['collections'])
+        ), 'collections')
+        promotions = self.insert(Promotion, (
+            Promotion(description=f'{rng.choice([5, 10, 15, 20, 25])}% off', discount=rng.choice([0.05, 0.1, 0.15, 0.2, 0.25]))
+            for _ in range(counts['promotions'])
+        ), 'promotions')
+        products = self.insert(Product, (
+            Product(
+                title=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}',
+                description=self.sentence(rng.randrange(8, 30)),
+                price=self.price(),
+                inventory=rng.randrange(0, 500),
+                collection_id=rng.choice(collections),
+            )
+            for n in range(counts['products'])
+        ), 'products')
+        self.insert(Product.promotions.through, (
+            Product.promotions.through(product_id=product_id, promotion_id=rng.choice(promotions))
+            for product_id in products if rng.random() < 0.1
+        ), 'product promotions')
+
+        users = self.insert(get_user_model(), self.users(counts['users']), 'users')
+        # bulk_create skips the post_save handler that normally creates the customer
+        customers = self.insert(Customer, (
+            Customer(user_id=user_id, membership=rng.choice(Customer.typeChoice.values)) for user_id in users
+        ), 'customers')
+
+        self.insert_carts(counts['carts'], products)
+        self.insert_orders(counts['orders'], customers, products)
+
+        with explicit_timestamps(Review, 'date'):
+            self.insert(Review, (
+                Review(
+                    product_id=rng.choice(products), name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                    description=self.sentence(rng.randrange(5, 40)), date=self.past(),
+                )
+                for _ in range(counts['reviews'])
+            ), 'reviews')
+
+        product_type = ContentType.objects.get_for_model(Product)
+        tags = self.insert(Tag, (Tag(label=f'{rng.choice(WORDS)}-{n}') for n in range(counts['tags'])), 'tags')
+        self.insert(TaggedItem, (
+            TaggedItem(tag_id=rng.choice(tags), content_type=product_type, object_id=rng.choice(products))
+            for _ in range(counts['tagged_items'])
+        ), 'tagged items')
+        self.insert(LikeItem, self.likes(counts['likes'], users, products, product_type), 'likes')
+        return {'collections': collections, 'products': products}
+
+    def users(self, count):
+        # hashing once keeps a million users from costing a million PBKDF2 runs
+        password = make_password(PASSWORD)
+        for n in range(count):
+            first, last = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+            username = f'fx-{self.run}-{n}'
+            yield get_user_model()(
+                username=username, email=f'{username}@example.com', password=password,
+                first_name=first, last_name=last, date_joined=self.past(),
+            )
+
+    def cart_id(self):
+        return uuid.UUID(int=self.random.getrandbits(128)).hex
+
+    def insert_carts(self, count, products):
+        rng, carts, items = self.random, [], []
+        with explicit_timestamps(Cart, 'created_at'):
+            for _ in range(count):
+                cart = Cart(id=self.cart_id(), created_at=self.past())
+                carts.append(cart)
+                for product_id in rng.sample(products, min(rng.randrange(1, 9), len(products))):
+                    items.append(CartItem(cart_id=cart.id, product_id=product_id, quantity=rng.randrange(1, 6)))
+                if len(carts) >= self.batch_size:
+                    self.flush_carts(carts, items)
+                    carts, items = [], []
+            self.flush_carts(carts, items)
+
+    def flush_carts(self, carts, items):
+        with transaction.atomic():
+            Cart.objects.bulk_create(carts)
+            CartItem.objects.bulk_create(items, batch_size=self.batch_size)
+        self.log(f'carts: {len(carts)} inserted with {len(items)} items')
+
+    def insert_orders(self, count, customers, products):
+        rng = self.random
+        with explicit_timestamps(Order, 'placed_at'):
+            orders = self.insert(Order, (
+                Order(
+                    customer_id=rng.choice(customers), placed_at=self.past(),
+                    payment_status=rng.choices(Order.typeChoice.values, weights=[2, 7, 1])[0],
+                )
+                for _ in range(count)
+            ), 'orders')
+        prices = {}
+        self.insert(OrderItem, (
+            OrderItem(order_id=order_id, product_id=product_id, quantity=rng.randrange(1, 5), unit_price=prices.setdefault(product_id, self.price()))
+            for order_id in orders
+            for product_id in rng.sample(products, min(rng.randrange(1, 6), len(products)))
+        ), 'order items')
+
+    def likes(self, count, users, products, product_type):
+        seen = set()
+        for _ in range(count * 2):
+            if len(seen) == count:
+                return
+            pair = (self.random.choice(users), self.random.choice(products))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            yield LikeItem(user_id=pair[0], content_type=product_type, object_id=pair[1])
@@ -0,0 +1,17 @@
+from celery import shared_task
+from store import images, outbox
+
+
+@shared_task
+def drain_outbox():
+    return outbox.drain()
+
+
+@shared_task
+def purge_outbox():
+    return outbox.purge_processed()
+
+
+@shared_task(autoretry_for=(OSError,), retry_backoff=True, max_retries=3)
+def generate_image_variants(image_id, source_name):
+    return len(images.build_variants(image_id, source_name))
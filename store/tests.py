@@ -1,3 +1,647 @@
-from django.test import TestCase
+import base64
+import json
+import shutil
+import tempfile
+import uuid
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models.fields.files import FieldFile
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from store import cache as catalog_cache
+from store import idempotency, images, outbox
+from store.autocomplete import COLLECTION, PRODUCT, PrefixIndex
+from store.carts import DatabaseCartStore, LocMemCartStore, upsert_cart_items
+from store.checkout import CartUnavailable, InvalidQuantity, OutOfStock, place_order, reserve_inventory
+from store.models import Cart, CartItem, Collection, Customer, ImageBlob, Order, OrderItem, OutboxEvent, Product, ProductImage
+from store.signals import order_created
+from store.storage import ContentAddressedStorage
+from tags.models import Tag, TaggedItem
+
+
+class OrderListQueryCountTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.customer_user = user_model.objects.create_user(username='buyer', email='buyer@example.com', password='secret-pass')
+        cls.staff_user = user_model.objects.create_user(username='staff', email='staff@example.com', password='secret-pass', is_staff=True)
+        customer = Customer.objects.get(user=cls.customer_user)
+        collection = Collection.objects.create(title='Tools')
+        products = [
+            Product.objects.create(title=f'Product {n}', description='', price=Decimal('10.00'), inventory=100, collection=collection)
+            for n in range(3)
+        ]
+        for _ in range(5):
+            order = Order.objects.create(customer=customer)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=2, unit_price=product.price) for product in products
+            ])
+
+    def test_customer_list_is_two_queries(self):
+        self.client.force_authenticate(self.customer_user)
+        # orders joined through customer, then items with their products
+        with self.assertNumQueries(2):
+            response = self.client.get('/store/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(response.data[0]['items']), 3)
+
+    def test_staff_list_is_two_queries(self):
+        self.client.force_authenticate(self.staff_user)
+        with self.assertNumQueries(2):
+            response = self.client.get('/store/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+
+    def test_summary_list_is_one_query(self):
+        self.client.force_authenticate(self.customer_user)
+        with self.assertNumQueries(1):
+            response = self.client.get('/store/orders/', {'view': 'summary'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['items_count'], 3)
+        self.assertEqual(Decimal(str(response.data[0]['total_price'])), Decimal('60.00'))
+
+
+class KeysetPaginationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = Collection.objects.create(title='Tools')
+        # repeated titles, so id has to break the ties
+        cls.products = [
+            Product.objects.create(title=title, description='', price=Decimal('10.00'), inventory=10, collection=collection)
+            for title in ['Drill', 'Axe', 'Drill', 'Saw', 'Axe']
+        ]
+        cls.expected_ids = [product.pk for product in sorted(cls.products, key=lambda product: (product.title, product.pk))]
+
+    def get_page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def cursor(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def test_cursor_round_trip(self):
+        page = self.get_page('/store/products/', {'paginate': 'keyset', 'page_size': 2})
+        self.assertIsNone(page['previous'])
+        pages = [[product['id'] for product in page['results']]]
+        while page['next']:
+            page = self.get_page(page['next'])
+            pages.append([product['id'] for product in page['results']])
+        self.assertEqual(sum(pages, []), self.expected_ids)
+        self.assertEqual([len(ids) for ids in pages], [2, 2, 1])
+
+        # and back again through the previous links
+        while page['previous']:
+            page = self.get_page(page['previous'])
+            self.assertEqual([product['id'] for product in page['results']], pages.pop(-2))
+        self.assertEqual(len(pages), 1)
+
+    def test_tampered_cursor_is_not_found(self):
+        for cursor in [
+            '!!!not-base64',
+            base64.urlsafe_b64encode(b'not json').decode(),
+            self.cursor({'r': 0}),
+            self.cursor({'v': ['Axe'], 'r': 0}),
+            self.cursor({'v': ['Axe', 'not-an-id'], 'r': 0}),
+            self.cursor({'v': ['Axe', {'id': 1}], 'r': 0}),
+            self.cursor({'v': {'title': 'Axe', 'id': 1}, 'r': 0}),
+            self.cursor({'v': ['Axe', [1]], 'r': 0}),
+            self.cursor({'v': [None, 1], 'r': 0}),
+            self.cursor(['Axe', 1]),
+        ]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/store/products/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class UpsertCartItemsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = Collection.objects.create(title='Tools')
+        cls.products = [
+            Product.objects.create(title=f'Product {n}', description='', price=Decimal('10.00'), inventory=100, collection=collection)
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        self.cart = Cart.objects.create()
+
+    def quantities(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list('product_id', 'quantity'))
+
+    def test_inserts_new_lines_and_increments_existing_ones(self):
+        first, second, third = self.products
+        CartItem.objects.create(cart=self.cart, product=first, quantity=2)
+        items = upsert_cart_items(self.cart.pk, [(first.pk, 3), (second.pk, 1)])
+        self.assertEqual(self.quantities(), {first.pk: 5, second.pk: 1})
+        self.assertEqual({item.product_id: item.quantity for item in items}, {first.pk: 5, second.pk: 1})
+        self.assertTrue(all(item.pk is not None for item in items))
+        self.assertNotIn(third.pk, self.quantities())
+
+    def test_store_merges_repeated_products(self):
+        first, second, _ = self.products
+        # one line per product, an upsert may not touch the same row twice
+        items = DatabaseCartStore().add_items(self.cart.pk, [(first.pk, 1), (second.pk, 2), (first.pk, 4)])
+        self.assertEqual(len(items), 2)
+        self.assertEqual(self.quantities(), {first.pk: 5, second.pk: 2})
+
+
+class PlaceOrderTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='buyer', email='buyer@example.com', password='secret-pass')
+        collection = Collection.objects.create(title='Tools')
+        cls.products = [
+            Product.objects.create(title=f'Product {n}', description='', price=Decimal('10.00'), inventory=5, collection=collection)
+            for n in range(2)
+        ]
+
+    def setUp(self):
+        self.store = DatabaseCartStore()
+        self.cart = self.store.create_cart()
+
+    def inventory(self):
+        return dict(Product.objects.filter(pk__in=[product.pk for product in self.products]).values_list('id', 'inventory'))
+
+    def checkout(self, lines):
+        self.store.add_items(self.cart.pk, lines)
+        return place_order(self.user.pk, self.cart.pk, self.store.get_lines(self.cart.pk), self.store)
+
+    def test_places_order_reserves_inventory_and_deletes_cart(self):
+        first, second = self.products
+        order = self.checkout([(first.pk, 5), (second.pk, 2)])
+        self.assertEqual(order.customer, Customer.objects.get(user=self.user))
+        self.assertEqual(
+            sorted(order.items.values_list('product_id', 'quantity', 'unit_price')),
+            [(first.pk, 5, Decimal('10.00')), (second.pk, 2, Decimal('10.00'))],
+        )
+        # an exact fit is allowed, the stock just runs out
+        self.assertEqual(self.inventory(), {first.pk: 0, second.pk: 3})
+        self.assertFalse(Cart.objects.filter(pk=self.cart.pk).exists())
+
+    def test_publishes_order_created_in_the_outbox(self):
+        order = self.checkout([(self.products[0].pk, 1)])
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.topic, outbox.ORDER_CREATED)
+        self.assertEqual(event.payload, {'order_id': order.pk})
+        self.assertIsNone(event.processed_at)
+
+    def test_conditional_update_refuses_to_oversell(self):
+        first, second = self.products
+        with self.assertRaises(OutOfStock) as raised:
+            reserve_inventory([(first.pk, 6), (second.pk, 1)])
+        self.assertEqual(raised.exception.product_ids, [first.pk])
+        # the short row is not matched; undoing the rest is up to place_order's transaction
+        self.assertEqual(self.inventory(), {first.pk: 5, second.pk: 4})
+
+    @override_settings(STORE_CHECKOUT_BATCH_SIZE=1)
+    def test_out_of_stock_rolls_everything_back(self):
+        first, second = self.products
+        # the first batch (first product) is reserved before the second one comes up short
+        with self.assertRaises(OutOfStock) as raised:
+            self.checkout([(first.pk, 2), (second.pk, 6)])
+        self.assertEqual(raised.exception.product_ids, [second.pk])
+        self.assertEqual(self.inventory(), {first.pk: 5, second.pk: 5})
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(sorted(self.store.get_lines(self.cart.pk)), sorted([(first.pk, 2), (second.pk, 6)]))
+
+    def test_second_checkout_of_the_same_cart_is_refused(self):
+        first = self.products[0]
+        lines = [(first.pk, 2)]
+        self.store.add_items(self.cart.pk, lines)
+        place_order(self.user.pk, self.cart.pk, lines, self.store)
+        # a request that read the lines before the first one deleted the cart
+        with self.assertRaises(CartUnavailable):
+            place_order(self.user.pk, self.cart.pk, lines, self.store)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.inventory()[first.pk], 3)
+
+    def test_non_positive_quantities_are_rejected(self):
+        first, second = self.products
+        with self.assertRaises(InvalidQuantity) as raised:
+            place_order(self.user.pk, self.cart.pk, [(first.pk, 1), (second.pk, -3)], self.store)
+        self.assertEqual(raised.exception.product_ids, [second.pk])
+        self.assertEqual(self.inventory(), {first.pk: 5, second.pk: 5})
+        self.assertFalse(Order.objects.exists())
+
+    def test_cart_item_quantity_must_be_positive(self):
+        for quantity in (0, -1):
+            with self.subTest(quantity=quantity):
+                response = self.client.post(
+                    f'/store/carts/{self.cart.pk}/items/', {'product_id': self.products[0].pk, 'quantity': quantity}, format='json',
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.store.get_lines(self.cart.pk), [])
+
+
+class ClaimedCartCheckoutTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='buyer', email='buyer@example.com', password='secret-pass')
+        collection = Collection.objects.create(title='Tools')
+        cls.product = Product.objects.create(title='Drill', description='', price=Decimal('10.00'), inventory=5, collection=collection)
+
+    def setUp(self):
+        # a store outside the database transaction, like RedisCartStore
+        self.store = LocMemCartStore()
+        self.cart = self.store.create_cart()
+        self.addCleanup(self.store.delete_cart, self.cart.pk)
+        self.addCleanup(self.store.delete_claimed_cart, self.cart.pk)
+
+    def test_claimed_cart_cannot_be_checked_out_twice(self):
+        self.store.add_item(self.cart.pk, self.product.pk, 2)
+        # the lines passed in are stale, the claimed ones are ordered
+        order = place_order(self.user.pk, self.cart.pk, [(self.product.pk, 1)], self.store)
+        self.assertEqual(list(order.items.values_list('quantity', flat=True)), [2])
+        self.assertIsNone(self.store.get_lines(self.cart.pk))
+        with self.assertRaises(CartUnavailable):
+            place_order(self.user.pk, self.cart.pk, [(self.product.pk, 2)], self.store)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_checkout_puts_the_cart_back(self):
+        self.store.add_item(self.cart.pk, self.product.pk, 6)
+        with self.assertRaises(OutOfStock):
+            place_order(self.user.pk, self.cart.pk, [(self.product.pk, 6)], self.store)
+        self.assertEqual(self.store.get_lines(self.cart.pk), [(self.product.pk, 6)])
+
+
+class OutboxDrainTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(username='buyer', email='buyer@example.com', password='secret-pass')
+        customer = Customer.objects.get(user=user)
+        cls.failing_order, cls.order = Order.objects.create(customer=customer), Order.objects.create(customer=customer)
+
+    def setUp(self):
+        self.failing_event = outbox.publish(outbox.ORDER_CREATED, order_id=self.failing_order.pk)
+        self.event = outbox.publish(outbox.ORDER_CREATED, order_id=self.order.pk)
+
+    def failing_receiver(self, sender, order, **kwargs):
+        if order.pk == self.failing_order.pk:
+            # a real database error: on PostgreSQL it aborts the transaction it runs in
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT * FROM store_no_such_table')
+
+    def test_receiver_database_error_is_recorded_and_does_not_block_the_batch(self):
+        order_created.connect(self.failing_receiver)
+        self.addCleanup(order_created.disconnect, self.failing_receiver)
+        self.assertEqual(outbox.drain_batch(10), (2, 1))
+
+        self.failing_event.refresh_from_db()
+        self.assertEqual(self.failing_event.attempts, 1)
+        self.assertIsNone(self.failing_event.processed_at)
+        self.assertIn('failing_receiver', self.failing_event.last_error)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attempts, 1)
+        self.assertIsNotNone(self.event.processed_at)
+
+    @override_settings(STORE_OUTBOX_MAX_ATTEMPTS=2)
+    def test_event_goes_dead_after_max_attempts(self):
+        order_created.connect(self.failing_receiver)
+        self.addCleanup(order_created.disconnect, self.failing_receiver)
+        outbox.drain_batch(10)
+        self.assertEqual(outbox.drain_batch(10), (1, 1))
+        self.assertEqual(outbox.drain_batch(10), (0, 0))
+        self.assertEqual(outbox.metrics()['dead'], 1)
+
+
+class IdempotencyTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = Collection.objects.create(title='Tools')
+        cls.product = Product.objects.create(title='Drill', description='', price=Decimal('10.00'), inventory=5, collection=collection)
+
+    def setUp(self):
+        # keys outlive the test transaction in the cache
+        self.key = uuid.uuid4().hex
+        self.cart = DatabaseCartStore().create_cart()
+        self.path = f'/store/carts/{self.cart.pk}/items/'
+
+    def post(self, data):
+        return self.client.post(self.path, data, format='json', HTTP_IDEMPOTENCY_KEY=self.key)
+
+    def test_retry_replays_the_response(self):
+        first = self.post({'product_id': self.product.pk, 'quantity': 2})
+        retry = self.post({'product_id': self.product.pk, 'quantity': 2})
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        # the line was added once
+        self.assertEqual(CartItem.objects.get(cart_id=self.cart.pk).quantity, 2)
+
+    def test_rejected_request_is_replayed_too(self):
+        first = self.post({'product_id': self.product.pk, 'quantity': 0})
+        retry = self.post({'product_id': self.product.pk, 'quantity': 0})
+        self.assertEqual(first.status_code, 400)
+        self.assertEqual((retry.status_code, retry.data), (400, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_same_key_with_another_body_is_422(self):
+        self.post({'product_id': self.product.pk, 'quantity': 0})
+        response = self.post({'product_id': self.product.pk, 'quantity': 1})
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(CartItem.objects.filter(cart_id=self.cart.pk).exists())
+
+    def test_retry_while_in_flight_is_409(self):
+        # what the first request holds while it runs
+        request = Request(APIRequestFactory().post(self.path))
+        lock_key = idempotency.cache_key(request, self.key) + ':lock'
+        idempotency.get_cache().add(lock_key, 1)
+        self.addCleanup(idempotency.get_cache().delete, lock_key)
+
+        response = self.post({'product_id': self.product.pk, 'quantity': 1})
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(CartItem.objects.filter(cart_id=self.cart.pk).exists())
+
+    def test_keys_are_scoped_to_the_caller(self):
+        self.post({'product_id': self.product.pk, 'quantity': 1})
+        user = get_user_model().objects.create_user(username='buyer', email='buyer@example.com', password='secret-pass')
+        self.client.force_authenticate(user)
+        response = self.post({'product_id': self.product.pk, 'quantity': 1})
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(CartItem.objects.get(cart_id=self.cart.pk).quantity, 2)
+
+
+class ImageBlobTests(APITestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def upload(self, data):
+        # a FieldFile as the post_save handler sees it after the storage skipped an existing blob
+        name = self.storage.save('store/images/photo.jpg', ContentFile(data))
+        field_file = FieldFile(None, ProductImage._meta.get_field('image'), name)
+        field_file.storage, field_file._file = self.storage, ContentFile(data)
+        return field_file
+
+    def test_identical_uploads_share_one_file(self):
+        first, second = self.upload(b'same bytes'), self.upload(b'same bytes')
+        self.assertEqual(first.name, second.name)
+        self.assertNotEqual(self.upload(b'other bytes').name, first.name)
+
+    def test_blob_deleted_before_retain_is_written_again(self):
+        field_file = self.upload(b'image bytes')
+        # a concurrent release deleted the file between the storage's exists() and retain()
+        self.storage.delete(field_file.name)
+        images.retain(field_file.name)
+        self.assertTrue(images.restore_if_missing(field_file))
+        with self.storage.open(field_file.name) as file:
+            self.assertEqual(file.read(), b'image bytes')
+        self.assertFalse(images.restore_if_missing(field_file))
+
+    def test_referenced_blob_is_not_deleted(self):
+        ImageBlob.objects.create(name='store/images/ab/ab.jpg', refcount=1)
+        self.assertFalse(images.delete_if_unreferenced('store/images/ab/ab.jpg'))
+        self.assertTrue(ImageBlob.objects.filter(name='store/images/ab/ab.jpg').exists())
+
+
+class AutocompleteIndexTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = Collection.objects.create(title='Garden Tools')
+        cls.mouse = Product.objects.create(title='Wireless Mouse', description='', price=Decimal('10.00'), inventory=5, collection=cls.collection)
+        cls.keyboard = Product.objects.create(title='Wired Keyboard', description='', price=Decimal('10.00'), inventory=5, collection=cls.collection)
+
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.build()
+
+    def ids(self, results, kind=PRODUCT):
+        return sorted(row['id'] for row in results[kind])
+
+    def test_prefix_matches_the_start_of_any_word(self):
+        self.assertEqual(self.ids(self.index.lookup('mou')), [self.mouse.pk])
+        self.assertEqual(self.ids(self.index.lookup('WIR')), sorted([self.mouse.pk, self.keyboard.pk]))
+        self.assertEqual(self.ids(self.index.lookup('tool'), COLLECTION), [self.collection.pk])
+        self.assertEqual(self.index.lookup('ouse'), {PRODUCT: [], COLLECTION: []})
+
+    def test_committed_changes_apply_locally(self):
+        self.index.add(PRODUCT, self.mouse.pk, 'Gaming Mouse')
+        self.assertEqual(self.ids(self.index.lookup('gam')), [self.mouse.pk])
+        self.assertEqual(self.ids(self.index.lookup('wir')), [self.keyboard.pk])
+        self.index.remove(PRODUCT, self.keyboard.pk)
+        self.assertEqual(self.ids(self.index.lookup('wir')), [])
+
+    def test_lookup_never_builds_on_the_request_path(self):
+        index, started = PrefixIndex(), []
+        index._rebuild_in_background = lambda: started.append(True)
+        with self.assertNumQueries(0):
+            self.assertEqual(index.lookup('wir'), {PRODUCT: [], COLLECTION: []})
+        self.assertEqual(started, [True])
+
+
+class CatalogCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='buyer', email='buyer@example.com', password='secret-pass')
+        cls.collection = Collection.objects.create(title='Tools')
+        cls.other_collection = Collection.objects.create(title='Garden')
+        cls.product = Product.objects.create(title='Drill', description='', price=Decimal('10.00'), inventory=5, collection=cls.collection)
+
+    def get(self, path, params=None):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def detail(self):
+        return self.get(f'/store/products/{self.product.pk}/')
+
+    def test_second_request_is_a_hit(self):
+        self.assertEqual(self.detail()['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(self.detail()['X-Catalog-Cache'], 'HIT')
+        response = self.get(f'/store/products/{self.product.pk}/', {'nocache': 1})
+        self.assertEqual(response['X-Catalog-Cache'], 'BYPASS')
+
+    def test_product_save_invalidates_its_pages(self):
+        self.get('/store/products/')
+        self.detail()
+        self.product.title = 'Hammer drill'
+        self.product.save()
+        for response in (self.get('/store/products/'), self.detail()):
+            self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(self.detail().data['title'], 'Hammer drill')
+
+    def test_collection_pages_only_follow_their_collection(self):
+        path = '/store/products/'
+        self.get(path, {'collection_id': self.other_collection.pk})
+        before = catalog_cache.stats()['invalidations']
+        self.product.title = 'Hammer drill'
+        self.product.save()
+        self.assertGreater(catalog_cache.stats()['invalidations'], before)
+        # the other collection's page did not change
+        self.assertEqual(self.get(path, {'collection_id': self.other_collection.pk})['X-Catalog-Cache'], 'HIT')
+
+    def test_checkout_invalidates_cached_inventory(self):
+        self.assertEqual(self.detail().data['inventory'], 5)
+        self.get('/store/products/')
+        store = DatabaseCartStore()
+        cart = store.create_cart()
+        store.add_items(cart.pk, [(self.product.pk, 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user.pk, cart.pk, store.get_lines(cart.pk), store)
+        # the list key has no last_update in it, only the bumped version moves it
+        response = self.get('/store/products/')
+        self.assertEqual(response['X-Catalog-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['inventory'], 3)
+        self.assertEqual(self.detail().data['inventory'], 3)
+
+
+class ConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.collection = Collection.objects.create(title='Tools')
+        cls.product = Product.objects.create(title='Drill', description='', price=Decimal('10.00'), inventory=5, collection=cls.collection)
+
+    def get(self, path, params=None, **headers):
+        return self.client.get(path, params, **headers)
+
+    def test_detail_revalidates_with_304(self):
+        path = f'/store/products/{self.product.pk}/'
+        response = self.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        with self.assertNumQueries(1):  # the last_update lookup only
+            response = self.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.product.title = 'Hammer drill'
+        self.product.save()
+        response = self.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_revalidates_with_304(self):
+        etag = self.get('/store/products/')['ETag']
+        self.assertEqual(self.get('/store/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # another query is another representation
+        self.assertEqual(self.get('/store/products/', {'ordering': 'price'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        Product.objects.create(title='Saw', description='', price=Decimal('5.00'), inventory=1, collection=self.collection)
+        self.assertEqual(self.get('/store/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_expanded_collection_moves_the_detail_etag(self):
+        path = f'/store/products/{self.product.pk}/'
+        response = self.get(path, {'expand': 'collection'})
+        self.assertEqual(response.data['collection'], {'id': self.collection.pk, 'title': 'Tools'})
+        # a collection edit leaves last_update alone, so there is no Last-Modified to go by
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.get(path, {'expand': 'collection'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.collection.title = 'Power tools'
+        self.collection.save()
+        response = self.get(path, {'expand': 'collection'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['collection']['title'], 'Power tools')
+
+
+class SparseFieldsetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = Collection.objects.create(title='Tools')
+        cls.product = Product.objects.create(title='Drill', description='Cordless', price=Decimal('10.00'), inventory=5, collection=collection)
+        cls.user = get_user_model().objects.create_user(username='buyer', email='buyer@example.com', password='secret-pass')
+        order = Order.objects.create(customer=Customer.objects.get(user=cls.user))
+        OrderItem.objects.create(order=order, product=cls.product, quantity=1, unit_price=cls.product.price)
+
+    def products(self, params):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/store/products/', {**params, 'nocache': 1})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0], [query['sql'] for query in captured.captured_queries]
+
+    def test_fields_keeps_only_those_fields_and_columns(self):
+        row, queries = self.products({'fields': 'id,title'})
+        self.assertEqual(list(row), ['id', 'title'])
+        # count and page, no images prefetch, no description column
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('description', queries[-1])
+
+    def test_omit_drops_fields(self):
+        row, queries = self.products({'omit': 'description,images'})
+        self.assertEqual(list(row), ['id', 'title', 'price', 'inventory', 'collection', 'price_with_tax'])
+        self.assertEqual(len(queries), 2)
+
+    def test_expand_swaps_the_id_for_the_object(self):
+        row, queries = self.products({'fields': 'id', 'expand': 'collection'})
+        self.assertEqual(row, {'id': self.product.pk, 'collection': {'id': self.product.collection_id, 'title': 'Tools'}})
+        # joined into the page query
+        self.assertEqual(len(queries), 2)
+
+    def test_unknown_names_are_400(self):
+        for params in ({'fields': 'id,colour'}, {'omit': 'colour'}, {'expand': 'price'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/store/products/', params).status_code, 400)
+
+    def test_orders_without_items_are_one_query(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get('/store/orders/', {'omit': 'items'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('items', response.data[0])
+
+
+class FastProductReadTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        collection = Collection.objects.create(title='Tools')
+        cls.products = [
+            Product.objects.create(title=f'Drill {n}', description='Cordless', price=price, inventory=n, collection=collection)
+            for n, price in enumerate([Decimal('19.99'), Decimal('0.10'), Decimal('1234.5')])
+        ]
+        first = cls.products[0]
+        # rows only: the upload signal handlers would look for the files
+        ProductImage.objects.bulk_create([
+            ProductImage(product=first, image='store/images/drill.jpg', variants=[
+                {'width': 320, 'height': 200, 'name': 'store/images/variants/drill_320.webp'},
+                {'width': 640, 'height': 400, 'name': 'store/images/variants/drill_640.webp'},
+            ]),
+            ProductImage(product=first, image='store/images/drill-side.jpg'),
+        ])
+        tag = Tag.objects.create(label='power tools')
+        TaggedItem.objects.create(tag=tag, content_type=ContentType.objects.get_for_model(Product), object_id=first.pk)
+
+    def assertSameBytes(self, path, params=None):
+        params = {**(params or {}), 'nocache': 1}
+        expected = self.client.get(path, params)
+        with override_settings(STORE_FAST_PRODUCT_READS=True):
+            response = self.client.get(path, params)
+        self.assertEqual(expected.status_code, 200)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+
+    def test_list(self):
+        self.assertSameBytes('/store/products/')
+
+    def test_detail(self):
+        for product in self.products:
+            with self.subTest(product=product.pk):
+                self.assertSameBytes(f'/store/products/{product.pk}/')
+
+    def test_sparse_fieldsets_and_tags(self):
+        for params in (
+            {'fields': 'id,price,price_with_tax'},
+            {'omit': 'description,images'},
+            {'fields': 'title,images'},
+            {'include': 'tags'},
+            {'fields': 'id', 'include': 'tags'},
+        ):
+            with self.subTest(params=params):
+                self.assertSameBytes('/store/products/', params)
+                self.assertSameBytes(f'/store/products/{self.products[0].pk}/', params)
+
+    def test_missing_product_is_404(self):
+        with override_settings(STORE_FAST_PRODUCT_READS=True):
+            self.assertEqual(self.client.get('/store/products/0/').status_code, 404)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+
+def max_image_upload_bytes():
+    return getattr(settings, 'STORE_MAX_IMAGE_UPLOAD_KB', 500) * 1024
+
+
+# Runs ahead of Django's memory/temporary-file handlers and aborts the parse as
+# soon as a file goes over the limit, instead of validating file.size after the
+# whole body has been read. DRF turns MultiPartParserError into a 400.
+class SizeLimitUploadHandler(FileUploadHandler):
+    def __init__(self, request=None, limit=None):
+        super().__init__(request)
+        self.limit = limit if limit is not None else max_image_upload_bytes()
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # fail before reading anything when the declared body cannot fit (allowing for form overhead)
+        if content_length and content_length > self.limit + 64 * 1024:
+            raise MultiPartParserError(f'Upload exceeds {self.limit // 1024} KB')
+        return None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.limit:
+            raise MultiPartParserError(f'File "{self.file_name}" exceeds {self.limit // 1024} KB')
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
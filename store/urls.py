@@ -17,6 +17,7 @@ cart_router = routers.NestedDefaultRouter(router, 'carts', lookup = 'cart')
 cart_router.register('items', views.CartItemViewSet, basename='cart-items')
 
 urlpatterns = [
+    path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete'),
     path('', include(router.urls)),
     path('', include(product_router.urls)),
     path('', include(cart_router.urls)),
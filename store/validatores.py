@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
 def validate_file_size(file):
-    max_size_kb = 500
+    # uploads through the API are already cut off while streaming (store.uploads)
+    max_size_kb = getattr(settings, 'STORE_MAX_IMAGE_UPLOAD_KB', 500)
     if file.size > max_size_kb * 1024:
         raise ValidationError(f"File size should not exceed {max_size_kb} KB.")
\ No newline at end of file
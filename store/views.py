@@ -1,3 +1,6 @@
+from django.conf import settings
+from django.db.models import Count, DecimalField, F, Prefetch, Sum
+from django.http import Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser, DjangoModelPermissions
@@ -6,32 +9,102 @@ from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
+from rest_framework.views import APIView
 from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, UpdateModelMixin
 from .models import OrderItem, Product, Collection, ProductImage, Review, Cart, CartItem, Customer, Order, OrderItem
 from .permissions import IsAdminOrReadOnly, FullDjangoModelPermissions
-from store.pagination import DefaultPagination
+from store.pagination import DefaultPagination, KeysetSelectableMixin
 from store.filters import ProductFilter
-from .serializers import ProductSerializer,CollectionSerializer, ReviewSerializer,CartSerializer, CartItemSerializer,AddCartItemSerializer,OrderSerializer, CustomerSerializer, UpdateCartItemSerializer, CreateOrderSerializer,UpdateOrderSerializer, ProductImageSerializer
+from store.search import ProductSearchFilter
+from store.autocomplete import index as autocomplete_index
+from store.carts import get_cart_store
+from store.idempotency import idempotent
+from store import cache as catalog_cache
+from store import exports
+from store.uploads import SizeLimitUploadHandler
+from store.cache import CatalogCacheMixin
+from store.conditional import ConditionalGetMixin, time_bucket
+from store.fast_reads import FastProductReadMixin
+from .serializers import ProductSerializer,CollectionSerializer, ReviewSerializer,CartSerializer, CartItemSerializer,AddCartItemSerializer,OrderSerializer, CustomerSerializer, UpdateCartItemSerializer, CreateOrderSerializer,UpdateOrderSerializer, ProductImageSerializer, OrderSummarySerializer, product_tags
 
 
 # Combining Product and ProductDetail class based views using the ModelViewSet for removing redundancy
 # product list endpoint ---> store/products/
 # product detail endpoint ---> store/products/{id}/
-class ProductViewSet(ModelViewSet):
-    queryset = Product.objects.prefetch_related('images').all()
+class ProductViewSet(ConditionalGetMixin, CatalogCacheMixin, FastProductReadMixin, KeysetSelectableMixin, ModelViewSet):
+    queryset = Product.objects.all()
     serializer_class = ProductSerializer
 # applying filtering with django-filter 
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     # filterset_fields = ['collection_id', 'price']
     filterset_class = ProductFilter # custom filter class
-    search_fields = ['title', 'description']  # for search functionality
     ordering_fields = ['title', 'price']  # for ordering functionality
     pagination_class = DefaultPagination    
     permission_classes = [IsAdminOrReadOnly]
 
 
+    # columns each serializer field reads; id/title/price are always loaded for ordering and keyset cursors
+    field_columns = {
+        'description': ['description'],
+        'inventory': ['inventory'],
+        'collection': ['collection_id'],
+    }
+
+    def get_queryset(self):
+        queryset = Product.objects.all()
+        if self.request.method not in ('GET', 'HEAD'):
+            # writes save the instance, it must be fully loaded
+            return queryset.prefetch_related('images')
+        # ?fields= / ?omit= / ?expand= (DynamicFieldsMixin): read only what will be rendered
+        names, expanded = ProductSerializer.select_fields(self.request.query_params)
+        columns = ['id', 'title', 'price']
+        for name in names:
+            columns += self.field_columns.get(name, [])
+        if 'collection' in expanded:
+            queryset = queryset.select_related('collection')
+            columns += ['collection__id', 'collection__title']
+        if 'images' in names:
+            queryset = queryset.prefetch_related('images')
+        return queryset.only(*columns)
+
     def get_serializer_context(self):
         return {'request': self.request}
+
+    def get_serializer(self, *args, **kwargs):
+        # ?include=tags ---> tags for the whole page in one query (ProductSerializer.to_representation)
+        if args and self.request.method in ('GET', 'HEAD') and 'tags' in ProductSerializer.select_includes(self.request.query_params):
+            products = args[0] if kwargs.get('many') else [args[0]]
+            kwargs['context'] = {**self.get_serializer_context(), 'tags': product_tags([product.pk for product in products])}
+        return super().get_serializer(*args, **kwargs)
+
+    # conditional GET validators (store/conditional.py)
+    def get_list_validator(self, request):
+        # checkout bumps the versions once the order commits; the time bucket bounds
+        # anything else written with update() and no bump
+        version = catalog_cache.get_version(self.get_catalog_version_key(request, 'list'))
+        return f'{version}:{time_bucket()}'
+
+    def get_detail_validator(self, request):
+        # last_update moves on every save, checkout (reserve_inventory) and image change
+        try:
+            row = Product.objects.filter(pk=self.kwargs['pk']).values_list('last_update', 'collection_id').first()
+        except (TypeError, ValueError):
+            return None
+        if row is None:
+            return None
+        last_update, collection_id = row
+        _, expanded = ProductSerializer.select_fields(request.query_params)
+        if 'collection' in expanded:
+            # ?expand=collection renders the collection too, whose edits leave last_update alone;
+            # no Last-Modified then, a collection change would not move it
+            version = catalog_cache.get_version(catalog_cache.collection_version_key(collection_id))
+            return f'{last_update.isoformat()}:{version}', None
+        return last_update.isoformat(), last_update
+
+    # catalog cache counters ---> store/products/cache-stats/
+    @action(detail=False, methods=['GET'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(catalog_cache.stats())
     
     def destroy(self, request, *args, **kwargs):
         # product = get_object_or_404(Product, pk=id) # here we are making the DB call to get the product instance
@@ -42,9 +115,30 @@ class ProductViewSet(ModelViewSet):
             )
         return super().destroy(request, *args, **kwargs)
 
+# title autocomplete endpoint ---> store/autocomplete/?q=wire&limit=5
+# answered from the in-memory prefix index in store/autocomplete.py, no DB round trip
+class AutocompleteView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        return Response(autocomplete_index.lookup(request.query_params.get('q', ''), limit))
+
+
 class ProductImageViewSet(ModelViewSet):
     serializer_class = ProductImageSerializer
 
+    def initial(self, request, *args, **kwargs):
+        # must be in place before request.data parses the multipart body
+        request.upload_handlers.insert(0, SizeLimitUploadHandler(request))
+        super().initial(request, *args, **kwargs)
+
     def get_queryset(self):
         return ProductImage.objects.filter(product_id=self.kwargs['product_pk'])
     
@@ -55,17 +149,29 @@ class ProductImageViewSet(ModelViewSet):
 # Combining the CollectionList and CollectionDetail class based views
 # collection list endpoint ---> store/collections/
 # collection detail endpoint ---> store/collections/{pk}/
-class CollectionViewSet(ModelViewSet):
-    queryset = Collection.objects.all()
+class CollectionViewSet(ConditionalGetMixin, ModelViewSet):
     serializer_class = CollectionSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    # every collection or product change bumps these (store/signals/handlers.py)
+    def get_list_validator(self, request):
+        return catalog_cache.get_version(catalog_cache.GLOBAL_VERSION_KEY)
+
+    def get_detail_validator(self, request):
+        return catalog_cache.get_version(catalog_cache.collection_version_key(self.kwargs['pk'])), None
+
+    def get_queryset(self):
+        # either way the list is a single query, no COUNT per collection
+        if settings.STORE_DENORMALIZED_COLLECTION_COUNTS:
+            return Collection.objects.all()
+        return Collection.objects.annotate(annotated_products_count=Count('products'))
+
     def get_serializer_context(self):
         return {'request': self.request}
     
     def destroy(self, request, *args, **kwargs):
         # collection = get_object_or_404(Collection, pk=pk)
-        if Product.objects.filter(collection_id=kwargs['pk']).count() > 0:
+        if Product.objects.filter(collection_id=kwargs['pk']).exists():
             return Response(
                 {'error': 'Collection cannot be deleted because it includes one or more products.'},
                 status=status.HTTP_405_METHOD_NOT_ALLOWED
@@ -73,28 +179,77 @@ class CollectionViewSet(ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class ReviewViewSet(ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, KeysetSelectableMixin, ModelViewSet):
     serializer_class = ReviewSerializer
+    keyset_ordering = ['date', 'id']
+
+    # bumped on every review save/delete of the product
+    def get_list_validator(self, request):
+        return catalog_cache.get_version(catalog_cache.review_version_key(self.kwargs['product_pk']))
+
+    def get_detail_validator(self, request):
+        return self.get_list_validator(request), None
 # solving the nested routing issue by overriding the get_queryset method
     def get_queryset(self):
         return Review.objects.filter(product_id=self.kwargs['product_pk'])
 
     def get_serializer_context(self):
-        return {'product_id': self.kwargs['product_pk']}
+        return {'product_id': self.kwargs['product_pk'], 'request': self.request}
 
 
 class CartViewSet(CreateModelMixin,
                   RetrieveModelMixin, 
                   DestroyModelMixin, 
                   GenericViewSet):
-    queryset = Cart.objects.prefetch_related('items__product').all()
+    # carts live in the configured cart store (store/carts.py), not necessarily the database
     serializer_class = CartSerializer
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def get_object(self):
+        cart = get_cart_store().get_cart(self.kwargs['pk'])
+        if cart is None:
+            raise Http404
+        self.check_object_permissions(self.request, cart)
+        return cart
+
+    def perform_destroy(self, instance):
+        get_cart_store().delete_cart(instance.pk)
+
 class CartItemViewSet(ModelViewSet):
     http_method_names = ['get','post', 'patch', 'delete' ]
+    max_batch_size = 100
 
-    def get_queryset(self):
-        return CartItem.objects.select_related('product').filter(cart_id=self.kwargs['cart_pk'])
+    def get_serializer(self, *args, **kwargs):
+        # a list body on POST is a batch add
+        if isinstance(kwargs.get('data'), list):
+            kwargs.update(many=True, allow_empty=False, max_length=self.max_batch_size)
+        return super().get_serializer(*args, **kwargs)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        items = get_cart_store().list_items(self.kwargs['cart_pk'])
+        serializer = self.get_serializer(items, many=True)
+        return Response(serializer.data)
+
+    def get_object(self):
+        try:
+            item_id = int(self.kwargs['pk'])
+        except ValueError:
+            raise Http404
+        cart_item = get_cart_store().get_item(self.kwargs['cart_pk'], item_id)
+        if cart_item is None:
+            raise Http404
+        self.check_object_permissions(self.request, cart_item)
+        return cart_item
+
+    def perform_destroy(self, instance):
+        get_cart_store().remove_item(instance.cart_id, instance.id)
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -131,36 +286,71 @@ class CustomerViewSet(ModelViewSet):
             return Response(serializer.data)
 
 
-class OrderViewSet(ModelViewSet):
+class OrderViewSet(KeysetSelectableMixin, ModelViewSet):
     # queryset = Order.objects.all()
     # serializer_class = OrderSerializer
     http_method_names = ['get','post','patch', 'delete', 'head', 'options']
+    keyset_ordering = ['placed_at', 'id']
 
     def get_permissions(self):
-        if self.request.method in ['PATCH', 'DELETE']:
+        if self.request.method in ['PATCH', 'DELETE'] or self.action == 'export':
             return [IsAdminUser()]
         return [IsAuthenticated()]
 
+    # streaming sales export (staff only) ---> store/orders/export/?output=csv|ndjson&compress=gzip
+    # filters: placed_after, placed_before (ISO date/datetime), payment_status (P,C,F)
+    @action(detail=False, methods=['GET'])
+    def export(self, request):
+        chunks, content_type, filename = exports.export_stream(
+            request.query_params,
+            output=request.query_params.get('output', 'csv'),
+            compress=request.query_params.get('compress') == 'gzip',
+        )
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = CreateOrderSerializer(data = request.data,
                                            context = {'user_id':self.request.user.id})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
-        serializer = OrderSerializer(order)
+        # reload through the prefetch plan instead of lazily loading every item's product
+        serializer = OrderSerializer(self.get_queryset().get(pk=order.pk))
         return Response(serializer.data)
 
+    def is_summary_request(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
     def get_serializer_class(self):
         if self.request.method =='POST':
             return CreateOrderSerializer
         elif self.request.method =='PATCH':
             return UpdateOrderSerializer
+        elif self.is_summary_request():
+            return OrderSummarySerializer
         return OrderSerializer
     
     def get_queryset(self):
         user = self.request.user
+        queryset = Order.objects.all()
 
-        if user.is_staff:
-            return Order.objects.all()
-        
-        customer_id= Customer.objects.only('id').get(user_id=user.id)
-        return Order.objects.filter(customer_id=customer_id)
\ No newline at end of file
+        if not user.is_staff:
+            # joined through customer instead of looking the customer up first
+            queryset = queryset.filter(customer__user_id=user.id)
+
+        if self.is_summary_request():
+            # ?view=summary ---> item count and total computed in SQL, no items loaded
+            return queryset.annotate(
+                items_count=Count('items'),
+                total_price=Sum(F('items__quantity') * F('items__unit_price'), output_field=DecimalField(max_digits=12, decimal_places=2), default=0),
+            )
+        if self.request.method == 'GET' and 'items' not in OrderSerializer.select_fields(self.request.query_params)[0]:
+            return queryset  # ?omit=items / ?fields=... without items
+        # 2 queries whatever the page size: orders, then items joined to their products
+        return queryset.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product').only(
+                'id', 'order', 'quantity', 'unit_price', 'product__id', 'product__title', 'product__price',
+            ))
+        )
\ No newline at end of file
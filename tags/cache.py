@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from tags.models import TaggedItem
+
+
+# Tag counts are cached under a versioned key; tag changes bump the version
+# (core.signals.handlers) instead of deleting every cached variant.
+COUNTS_VERSION_KEY = 'tags:counts:version'
+
+
+def get_counts_version():
+    version = cache.get(COUNTS_VERSION_KEY)
+    if version is None:
+        # never restart at a version an evicted counter already handed out
+        cache.add(COUNTS_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(COUNTS_VERSION_KEY)
+    return version
+
+
+def bump_counts_version():
+    try:
+        cache.incr(COUNTS_VERSION_KEY)
+    except ValueError:
+        cache.set(COUNTS_VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def get_counts(model, model_label, limit):
+    key = f'tags:counts:{get_counts_version()}:{model_label}:{limit}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = TaggedItem.objects.get_counts(model, limit)
+        cache.set(key, counts, getattr(settings, 'TAGS_COUNTS_CACHE_TIMEOUT', 600))
+    return counts
@@ -10,6 +10,41 @@ class TaggedItemManager(models.Manager):
             content_type=content_type,
             object_id=object_id
         )
+
+    # {object_id: [Tag, ...]} for every id asked for, in one query however many
+    # objects there are (get_for_model is cached after the first call)
+    def get_tags_for_many(self, model, object_ids):
+        tags = {object_id: [] for object_id in object_ids}
+        if not tags:
+            return tags
+        content_type = ContentType.objects.get_for_model(model)
+        items = (
+            TaggedItem.objects.select_related('tag')
+            .filter(content_type=content_type, object_id__in=list(tags))
+            .order_by('object_id', 'tag__label', 'tag_id')
+        )
+        seen = set()
+        for item in items:
+            # the same tag applied twice is listed once
+            if (item.object_id, item.tag_id) not in seen:
+                seen.add((item.object_id, item.tag_id))
+                tags[item.object_id].append(item.tag)
+        return tags
+
+    # [{'id', 'label', 'count'}] most used first, for tag clouds; counts only
+    # objects of the given model when one is passed
+    def get_counts(self, model=None, limit=None):
+        items = TaggedItem.objects.all()
+        if model is not None:
+            items = items.filter(content_type=ContentType.objects.get_for_model(model))
+        counts = (
+            items.values('tag_id', 'tag__label')
+            .annotate(count=models.Count('id'))
+            .order_by('-count', 'tag__label', 'tag_id')
+        )
+        if limit is not None:
+            counts = counts[:limit]
+        return [{'id': row['tag_id'], 'label': row['tag__label'], 'count': row['count']} for row in counts]
 class Tag(models.Model):
     label = models.CharField(max_length=255)
 
@@ -29,3 +64,11 @@ class TaggedItem(models.Model):
     # ID 
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+
+    class Meta:
+        indexes = [
+            # tags of given objects (get_tags_for / get_tags_for_many)
+            models.Index(fields=['content_type', 'object_id'], name='tags_item_object_idx'),
+            # objects with a given tag (?tag= on products) and tag counts per model
+            models.Index(fields=['tag', 'content_type'], name='tags_item_tag_type_idx'),
+        ]
@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import tags
+from .views import tags, TagCountsView
 urlpatterns = [
-    path('firsttag/', tags)
+    path('firsttag/', tags),
+    path('counts/', TagCountsView.as_view()),
 ]
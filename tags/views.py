@@ -1,6 +1,34 @@
+from django.apps import apps
 from django.shortcuts import render
 from django.http import HttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from tags import cache as tag_cache
 
 # Create your views here.
 def tags(request):
-    return HttpResponse("i am from tags")
\ No newline at end of file
+    return HttpResponse("i am from tags")
+
+
+# tag cloud ---> tags/counts/?model=store.product&limit=50
+# [{"id", "label", "count"}] most used first, cached until a tag changes
+class TagCountsView(APIView):
+    permission_classes = [AllowAny]
+    default_limit = 50
+    max_limit = 500
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        model_label = request.query_params.get('model', '').lower()
+        model = None
+        if model_label:
+            try:
+                model = apps.get_model(model_label)
+            except (LookupError, ValueError):
+                raise ValidationError({'model': [f'Unknown model "{model_label}", expected app_label.model_name.']})
+        return Response(tag_cache.get_counts(model, model_label, limit))